@@ -0,0 +1,49 @@
+import base64
+import tkinter
+
+import headless
+
+# --- Static Background Cache ---
+# The static scene is hundreds of vector items (every turtle circle is a
+# polyline) that Tk re-composites on each screen.update(). Baking copies those
+# items into an offscreen canvas, rasterizes them once with the headless
+# rasterizer, installs the result as the screen's background picture and
+# deletes the vector items. Animated layers keep their own live items.
+
+_OPTIONS = {
+    "polygon": ("fill", "outline", "width"),
+    "line": ("fill", "width", "capstyle"),
+    "oval": ("fill", "outline", "width"),
+    "rectangle": ("fill", "outline", "width"),
+}
+
+def snapshot_items(canvas, items, width, height, bg):
+    # Copy `items` of a Tk (or headless) canvas into a HeadlessCanvas
+    snapshot = headless.HeadlessCanvas(width, height, bg=bg)
+    for item in items:
+        item_type = canvas.type(item)
+        if item_type not in _OPTIONS:
+            continue
+        options = {name: canvas.itemcget(item, name) for name in _OPTIONS[item_type]}
+        create = getattr(snapshot, "create_" + item_type)
+        create(*canvas.coords(item), **options)
+    return snapshot
+
+
+def make_image(screen, width, height, pixels):
+    if isinstance(screen, headless.HeadlessScreen):
+        return headless.HeadlessImage(width, height, pixels)
+    png = headless.encode_png(width, height, pixels)
+    return tkinter.PhotoImage(master=screen.getcanvas(), data=base64.b64encode(png), format="png")
+
+
+def bake_static_layer(screen, pen, width, height):
+    # Replace everything `pen` has drawn with a single width x height
+    # background image. Returns the image; the caller must keep a reference
+    # to it, Tk only shows a PhotoImage for as long as Python holds one.
+    canvas = screen.getcanvas()
+    snapshot = snapshot_items(canvas, pen.items, width, height, canvas.cget("bg"))
+    image = make_image(screen, width, height, headless.rasterize(snapshot))
+    screen._setbgpic(screen._bgpic, image) # Lowest item, centred on the origin
+    pen.clear()
+    return image
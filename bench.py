@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+import canvaspen
+
+# --- Benchmark Suite ---
+# Times the scene's hot paths on the headless backend with a fixed seed.
+#
+#   python bench.py                          # run all cases, print a table
+#   python bench.py --save results/v2.json   # also keep the results
+#   python bench.py --compare results/v1.json --save results/v2.json
+#   python bench.py --backend canvas         # helpers draw without turtle
+#
+# Saved results are JSON: run metadata plus, per case, per-call timing
+# statistics in milliseconds. --compare prints the change in p50 against an
+# earlier file and exits non-zero when a case got slower than --threshold.
+
+# Every case drives one headless Scene directly; its timer loop never runs.
+SCENE_ARGS = ["--headless", "--frames", "0"]
+
+SMOKE_COUNTS = (60, 600, 6000)
+COUPLE_SCALES = (0.5, 0.8, 1.0, 2.0)
+VILLAGE_CABINS = (10, 1000)
+
+
+def time_calls(func, frames, setup=None, teardown=None):
+    # Per-call wall time in ms; setup/teardown run outside the timed region
+    samples = []
+    for _ in range(frames):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+        if teardown:
+            teardown()
+    return samples
+
+
+def describe(samples):
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'frames': n,
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': ordered[(n - 1) // 2],
+        'p95_ms': ordered[min(n - 1, int(n * 0.95))],
+        'min_ms': ordered[0],
+        'max_ms': ordered[-1],
+        'stdev_ms': statistics.pstdev(ordered),
+    }
+
+
+# --- Cases ---
+def bench_startup(main, scene_args, frames):
+    # A fresh scene from construction to its first presented frame
+    def first_frame():
+        scene = main.Scene(main.parse_options(scene_args))
+        scene.step()
+        canvaspen.release(scene.screen) # Let the scene go
+    return time_calls(first_frame, min(frames, 10))
+
+
+def bench_smoke(main, scene, count, frames):
+    # Fill the store with `count` particles and time update+draw while all of
+    # them are alive (particles live at least 80 frames)
+    from particles import SmokeParticles
+    import simulation
+    state = scene.state
+    saved = state.smoke
+    state.smoke = SmokeParticles(count)
+    for _ in range(count):
+        simulation.emit_smoke(state)
+    samples = time_calls(scene.update_and_draw_all_smoke, min(frames, 79))
+    scene.smoke_layer.clear()
+    state.smoke = saved
+    return samples
+
+
+def bench_simulate(main, scene, frames):
+    # 1000 pure simulation steps, no drawing
+    import simulation
+    state = simulation.SceneState(1, scene.state.caption_lengths)
+    def thousand_steps():
+        for _ in range(1000):
+            simulation.step(state)
+    return time_calls(thousand_steps, frames)
+
+
+def bench_couple(main, scene, scale, frames):
+    pen = canvaspen.make_pen(scene.screen, scene.options.backend) # Scratch pen, cleared after every call
+    return time_calls(lambda: main.draw_holding_hands_couple_silhouette(pen, 0, 0, scale=scale),
+                      frames, teardown=pen.clear)
+
+
+def bench_tree(main, scene, frames):
+    return time_calls(lambda: main.draw_tree(scene.pen, 0, scene.ground_level_y), frames, teardown=scene.pen.clear)
+
+
+def bench_static_scene(main, scene, frames):
+    return time_calls(scene.build_static_scene, frames)
+
+
+def bench_animate_tick(main, scene, frames):
+    # One full frame: a simulation step followed by the draw pass
+    return time_calls(scene.step, frames)
+
+
+def bench_village(main, scene_args, cabins, frames):
+    # Frames of a panning village: cost should not grow with its size
+    scene = main.Scene(main.parse_options(scene_args + ["--village", str(cabins), "--seed", "1"]))
+    scene.build()
+    samples = time_calls(scene.step, frames)
+    canvaspen.release(scene.screen)
+    return samples
+
+
+def run_suite(frames, seed, only=None, backend="turtle"):
+    random.seed(seed)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+    scene_args = SCENE_ARGS + ["--backend", backend]
+    scene = main.Scene(main.parse_options(scene_args))
+    scene.build()
+
+    cases = []
+    cases.append(("startup", lambda: bench_startup(main, scene_args, frames)))
+    for count in SMOKE_COUNTS:
+        cases.append(("smoke_%d" % count, lambda count=count: bench_smoke(main, scene, count, frames)))
+    for scale in COUPLE_SCALES:
+        cases.append(("couple_x%g" % scale, lambda scale=scale: bench_couple(main, scene, scale, frames)))
+    cases.append(("simulate_1k", lambda: bench_simulate(main, scene, frames)))
+    cases.append(("draw_tree", lambda: bench_tree(main, scene, frames)))
+    cases.append(("static_scene", lambda: bench_static_scene(main, scene, frames)))
+    cases.append(("animate_tick", lambda: bench_animate_tick(main, scene, frames)))
+    for cabins in VILLAGE_CABINS:
+        cases.append(("village_%d" % cabins, lambda cabins=cabins: bench_village(main, scene_args, cabins, frames)))
+
+    results = {}
+    for name, case in cases:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        random.seed(seed) # Every case sees the same random stream
+        results[name] = describe(case())
+        print("%-14s p50 %9.3f ms  p95 %9.3f ms  max %9.3f ms" % (
+            name, results[name]['p50_ms'], results[name]['p95_ms'], results[name]['max_ms']), flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print("\n%-14s %11s %11s %8s" % ("case", "base p50", "new p50", "change"))
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        change = (stats['p50_ms'] - base['p50_ms']) / base['p50_ms'] if base['p50_ms'] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("%-14s %8.3f ms %8.3f ms %+7.1f%%%s" % (name, base['p50_ms'], stats['p50_ms'], change * 100, flag))
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scene's hot paths")
+    parser.add_argument("--frames", type=int, default=30, help="timed calls per case")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--only", nargs="*", help="run only cases whose name contains one of these")
+    parser.add_argument("--backend", choices=canvaspen.BACKENDS, default="turtle",
+                        help="drawing backend of the benchmarked scenes")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative p50 slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.frames, args.seed, args.only, args.backend)
+    report = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'frames': args.frames,
+            'seed': args.seed,
+            'backend': args.backend,
+        },
+        'results': results,
+    }
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
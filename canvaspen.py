@@ -0,0 +1,253 @@
+import math
+import turtle
+
+import headless
+
+# --- Direct Canvas Pen ---
+# A stand-in for turtle.RawTurtle that supports the subset of its API the
+# drawing helpers use, so the same helpers draw through either backend:
+#
+#   python main.py --backend canvas
+#
+# Turtle pays for every move: each forward() or goto() updates its own line
+# item's full coordinate list and the fill polygon, t.circle() is a loop of
+# such moves, and every pen change starts another item. This pen only does
+# the arithmetic. Moves append vertices to the stroke (while the pen is down)
+# and to the fill path (between begin_fill() and end_fill()); a stroke becomes
+# one line item when the pen is lifted or its color or size changes, a fill
+# one polygon item, and a fill outlined along its whole path (as every filled
+# helper shape is) a single polygon with an outline. Dots are one oval.
+#
+# Circles use turtle's vertex count for the same radius and extent, so both
+# backends draw the same picture and the circle_steps detail setting applies
+# to both.
+BACKENDS = ("turtle", "canvas")
+
+_colors = {} # Color strings already validated by a screen
+
+
+def make_pen(screen, backend="turtle"):
+    # A hidden pen, pen up, for the drawing helpers
+    if backend == "canvas":
+        pen = CanvasPen(screen)
+    else:
+        pen = turtle.RawTurtle(screen)
+        pen.speed(0)
+        pen.hideturtle()
+    pen.penup()
+    return pen
+
+
+def offscreen_pen(backend="turtle"):
+    # A pen on a fresh headless screen, for recording what a helper draws;
+    # hand the screen to release() when done
+    offscreen = headless.HeadlessScreen()
+    offscreen.tracer(0)
+    return offscreen, make_pen(offscreen, backend)
+
+
+def release(screen):
+    # Turtle keeps every screen one of its pens drew on; let this one go
+    if screen in turtle.RawTurtle.screens:
+        turtle.RawTurtle.screens.remove(screen)
+
+
+class CanvasPen:
+    def __init__(self, screen):
+        self.screen = screen
+        self.cv = screen.getcanvas()
+        self.items = [] # Canvas items drawn so far, cleared by clear()
+        self._x = 0.0
+        self._y = 0.0
+        self._heading = 0.0 # Degrees, counterclockwise from east
+        self._down = True
+        self._pencolor = "black"
+        self._fillcolor = "black"
+        self._pensize = 1
+        self._line = [(0.0, 0.0)] # Stroke so far while the pen is down
+        self._fill = None # Fill path since begin_fill()
+
+    # --- Output ---
+    def _coords(self, points):
+        xscale, yscale = self.screen.xscale, self.screen.yscale
+        coords = []
+        for x, y in points:
+            coords.append(x * xscale)
+            coords.append(-y * yscale) # Canvas y grows downwards
+        return coords
+
+    def _stroke(self):
+        # Emit the stroke drawn so far and start a new one at the pen
+        if len(self._line) > 1:
+            self.items.append(self.cv.create_line(*self._coords(self._line), fill=self._pencolor,
+                                                  width=self._pensize, capstyle="round"))
+        self._line = [(self._x, self._y)] if self._down else []
+
+    def _move(self, points):
+        if self._down:
+            self._line.extend(points)
+        if self._fill is not None:
+            self._fill.extend(points)
+        self._x, self._y = points[-1]
+
+    def _color(self, args):
+        if len(args) == 1 and isinstance(args[0], str):
+            color = _colors.get(args[0])
+            if color is None:
+                color = _colors[args[0]] = self.screen._colorstr(args)
+            return color
+        return self.screen._colorstr(args)
+
+    # --- Motion ---
+    def goto(self, x, y=None):
+        if y is None:
+            x, y = x
+        self._move([(float(x), float(y))])
+
+    setpos = setposition = goto
+
+    def forward(self, distance):
+        angle = math.radians(self._heading)
+        self._move([(self._x + distance * math.cos(angle), self._y + distance * math.sin(angle))])
+
+    fd = forward
+
+    def backward(self, distance):
+        self.forward(-distance)
+
+    back = bk = backward
+
+    def left(self, angle):
+        self._heading = (self._heading + angle) % 360
+
+    lt = left
+
+    def right(self, angle):
+        self.left(-angle)
+
+    rt = right
+
+    def setheading(self, angle):
+        self._heading = angle % 360
+
+    seth = setheading
+
+    def heading(self):
+        return self._heading
+
+    def circle(self, radius, extent=None, steps=None):
+        # The chords turtle would walk, computed in one go
+        if extent is None:
+            extent = 360
+        if steps is None:
+            steps = 1 + int(min(11 + abs(radius) / 6.0, 59.0) * abs(extent) / 360)
+        turn = extent / steps
+        chord = 2.0 * radius * math.sin(math.radians(turn / 2))
+        if radius < 0:
+            chord, turn = -chord, -turn
+        x, y = self._x, self._y
+        angle = self._heading + turn / 2
+        points = []
+        for _ in range(steps):
+            a = math.radians(angle)
+            x += chord * math.cos(a)
+            y += chord * math.sin(a)
+            points.append((x, y))
+            angle += turn
+        self._move(points)
+        self._heading = (self._heading + turn * steps) % 360
+
+    def pos(self):
+        return turtle.Vec2D(self._x, self._y)
+
+    position = pos
+
+    def xcor(self):
+        return self._x
+
+    def ycor(self):
+        return self._y
+
+    # --- Pen State ---
+    def penup(self):
+        self._stroke()
+        self._down = False
+        self._line = []
+
+    pu = up = penup
+
+    def pendown(self):
+        if not self._down:
+            self._down = True
+            self._line = [(self._x, self._y)]
+
+    pd = down = pendown
+
+    def isdown(self):
+        return self._down
+
+    def pensize(self, width=None):
+        if width is None:
+            return self._pensize
+        if width != self._pensize:
+            self._stroke()
+            self._pensize = width
+
+    width = pensize
+
+    def pencolor(self, *args):
+        if not args:
+            return self._pencolor
+        color = self._color(args)
+        if color != self._pencolor:
+            self._stroke()
+            self._pencolor = color
+
+    def fillcolor(self, *args):
+        if not args:
+            return self._fillcolor
+        self._fillcolor = self._color(args)
+
+    def speed(self, speed=None):
+        return 0 # Nothing is animated
+
+    def hideturtle(self):
+        pass # There is no cursor to hide
+
+    ht = hideturtle
+
+    # --- Shapes ---
+    def begin_fill(self):
+        self._stroke()
+        self._fill = [(self._x, self._y)]
+
+    def filling(self):
+        return self._fill is not None
+
+    def end_fill(self):
+        fill, self._fill = self._fill, None
+        if fill is None or len(fill) < 3:
+            return
+        if self._down and self._line == fill:
+            # Outlined all along: fill and outline are one polygon
+            self.items.append(self.cv.create_polygon(*self._coords(fill), fill=self._fillcolor,
+                                                     outline=self._pencolor, width=self._pensize))
+            self._line = [(self._x, self._y)]
+        else:
+            self.items.append(self.cv.create_polygon(*self._coords(fill), fill=self._fillcolor, outline=""))
+
+    def dot(self, size=None, *color):
+        if size is None:
+            size = max(self._pensize + 4, 2 * self._pensize)
+        color = self._color(color) if color else self._pencolor
+        self._stroke() # What was drawn so far stays below the dot
+        x, y = self._coords([(self._x, self._y)])
+        r = size / 2
+        self.items.append(self.cv.create_oval(x - r, y - r, x + r, y + r, fill=color, outline=""))
+
+    def clear(self):
+        for item in self.items:
+            self.cv.delete(item)
+        self.items = []
+        self._line = [(self._x, self._y)] if self._down else []
+        self._fill = None
@@ -0,0 +1,65 @@
+import tkinter.font
+
+import headless
+
+# --- Text Metrics ---
+# Glyph widths are measured once per (font, character) and shared by every
+# caption using that font; a string's width is the sum of its glyphs.
+_glyph_widths = {} # font -> {char: width}
+
+class TextMetrics:
+    def __init__(self, screen, font):
+        self.font = tuple(font)
+        self.widths = _glyph_widths.setdefault(self.font, {})
+        if isinstance(screen, headless.HeadlessScreen):
+            self._measure = lambda ch: headless.text_extent(ch, self.font)[0]
+        else:
+            tk_font = tkinter.font.Font(root=screen.getcanvas(), font=self.font)
+            self._measure = tk_font.measure
+
+    def glyph_width(self, ch):
+        width = self.widths.get(ch)
+        if width is None:
+            width = self.widths[ch] = self._measure(ch)
+        return width
+
+    def measure(self, text):
+        return sum(self.glyph_width(ch) for ch in text)
+
+
+# --- Typewriter Caption ---
+# One persistent canvas text item. Every caption string is measured once up
+# front; the item is anchored at the left edge of where the full string will
+# sit centred, so typing a character only swaps the item's text and already
+# typed glyphs never move.
+class Caption:
+    def __init__(self, screen, texts, x, y, font, color):
+        self.cv = screen.getcanvas()
+        self.texts = texts
+        self.x = x
+        self.y = y
+        self.metrics = TextMetrics(screen, font)
+        self.text_widths = [self.metrics.measure(text) for text in texts]
+        self.item = self.cv.create_text(x, -y, text="", anchor="sw", fill=color, font=font)
+        self.index = None
+        self.length = 0
+
+    def set_text(self, index, text):
+        # Replace caption `index` (e.g. a live caption slot)
+        self.texts[index] = text
+        self.text_widths[index] = self.metrics.measure(text)
+        if index == self.index:
+            self.index = None # Recentred on the next show
+
+    def show(self, index, length):
+        # Display the first `length` characters of caption `index`
+        if index == self.index and length == self.length:
+            return
+        if index != self.index:
+            self.cv.coords(self.item, self.x - self.text_widths[index] / 2, -self.y)
+            self.index = index
+        self.cv.itemconfigure(self.item, text=self.texts[index][:length])
+        self.length = length
+
+    def delete(self):
+        self.cv.delete(self.item)
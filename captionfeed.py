@@ -0,0 +1,110 @@
+import asyncio
+import os
+import stat
+import statistics
+import time
+from collections import deque
+
+# --- Live Caption Feed ---
+# Captions pushed in by a local process, one UTF-8 line each, over a Unix
+# socket or a named pipe:
+#
+#   echo "窗外下雪了" | nc -U /tmp/turtle_home.sock
+#   echo "窗外下雪了" > /tmp/turtle_home.fifo
+#
+# Readers run on an asyncio loop next to the animation (see Scene.run) and
+# put (text, arrival time) into a bounded queue that the caption typewriter
+# drains one caption at a time. When the queue is full the readers stop
+# reading until the typewriter catches up, so a fast sender is slowed down
+# by the socket or pipe filling up (backpressure) rather than growing
+# memory. Latency is measured from a line's arrival to its first glyph on
+# screen, queueing included.
+class CaptionFeed:
+    def __init__(self, maxsize=8, history=1000):
+        self.queue = asyncio.Queue(maxsize)
+        self.received = 0
+        self.shown = 0
+        self.latencies_ms = deque(maxlen=history)
+        self._server = None
+        self._tasks = []
+        self._connections = set() # Handler tasks of connected senders
+        self._paths = [] # Socket and pipe files to remove on close
+
+    # --- Sources ---
+    async def serve_socket(self, path):
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path) # Left over from an earlier run
+        self._server = await asyncio.start_unix_server(self._serve_connection, path)
+        self._paths.append(path)
+
+    async def read_pipe(self, path):
+        if not os.path.exists(path):
+            os.mkfifo(path)
+            self._paths.append(path)
+        # Opened read-write so the pipe never reports end of file: writers
+        # can come and go while it stays open
+        pipe = os.fdopen(os.open(path, os.O_RDWR | os.O_NONBLOCK), "rb", buffering=0)
+        reader = asyncio.StreamReader()
+        transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        task = asyncio.create_task(self._read_lines(reader))
+        task.add_done_callback(lambda _: transport.close())
+        self._tasks.append(task)
+
+    async def _serve_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            await self._read_lines(reader)
+        except asyncio.CancelledError:
+            pass # Cut off by close(); the connection just ends
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_lines(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            text = line.decode("utf-8", "replace").strip()
+            if text:
+                arrival = time.perf_counter()
+                self.received += 1
+                await self.queue.put((text, arrival)) # Waits while the queue is full
+
+    async def close(self):
+        # Senders still connected (idle, or held back by a full queue) are
+        # cut off: from Python 3.12 on, wait_closed() waits for every open
+        # connection
+        if self._server is not None:
+            self._server.close()
+        tasks = self._tasks + list(self._connections)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        for path in self._paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    # --- Consumer Side ---
+    def get_nowait(self):
+        # The next (text, arrival) or None; called from the frame loop
+        try:
+            return self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    def record_shown(self, arrival):
+        self.shown += 1
+        self.latencies_ms.append((time.perf_counter() - arrival) * 1000)
+
+    def status(self):
+        if not self.latencies_ms:
+            return "captions %d received, %d queued" % (self.received, self.queue.qsize())
+        return "captions %d shown, %d queued, latency p50 %.0f ms max %.0f ms" % (
+            self.shown, self.queue.qsize(), statistics.median(self.latencies_ms), max(self.latencies_ms))
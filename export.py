@@ -0,0 +1,226 @@
+import os
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import headless
+
+# --- Animation Export ---
+# Steps a headless Scene and streams its frames to an animated GIF, a
+# directory of PNG/PPM frames or a raw RGB24 stream (e.g. for ffmpeg:
+# `-f rawvideo -pix_fmt rgb24 -s 800x600 -r 20 -i frames.rgb`).
+#
+# The pipeline is a chain of generators: the scene yields detached display
+# lists, a process pool rasterizes and encodes them, and the writer consumes
+# the results in frame order. At most `max_in_flight` frames exist at once, so
+# memory stays flat however long the export runs.
+#
+# Frames are rasterized by headless.rasterize(), which paints text only with
+# Pillow and a CJK font: without them exports have no captions.
+FORMATS = ("gif", "png", "ppm", "raw")
+
+def guess_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".gif":
+        return "gif"
+    if ext in (".rgb", ".raw") or path == "-":
+        return "raw"
+    return "png" # Anything else is a directory of frames
+
+
+# --- Frame Source ---
+def display_lists(scene, frame_count, fps, step_hz):
+    # Frame i shows the simulation after floor((i + 1) * step_hz / fps) steps,
+    # so exports at any frame rate keep the animation's real speed
+    if not scene.built:
+        scene.build()
+    steps_done = 0
+    for i in range(frame_count):
+        target = int((i + 1) * step_hz / fps)
+        while steps_done < target:
+            scene.advance()
+            steps_done += 1
+        scene.draw()
+        yield scene.screen.getcanvas().snapshot()
+
+
+# --- GIF Encoding ---
+def gif_header(width, height):
+    # Logical screen without a global color table (every frame brings its
+    # own), plus the NETSCAPE2.0 extension to loop forever
+    return (b"GIF89a" + width.to_bytes(2, "little") + height.to_bytes(2, "little") + b"\x00\x00\x00"
+            + b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+
+GIF_TRAILER = b"\x3b"
+
+# Per-channel levels for frames with more than 256 colors (6x7x6 = 252)
+_QUANTIZE = [bytes(min(255, round(round(v * (levels - 1) / 255) * 255 / (levels - 1))) for v in range(256))
+             for levels in (6, 7, 6)]
+
+def palettize(pixels):
+    # RGB bytes -> (palette bytes, one index byte per pixel). Frames of this
+    # scene rarely exceed 256 colors (the rasterizer does not antialias);
+    # when they do the channels are quantized first.
+    packed = bytearray(len(pixels) // 3 * 4)
+    packed[0::4] = pixels[0::3]
+    packed[1::4] = pixels[1::3]
+    packed[2::4] = pixels[2::3]
+    colors = array('I', packed)
+    distinct = set(colors)
+    if len(distinct) > 256:
+        packed[0::4] = pixels[0::3].translate(_QUANTIZE[0])
+        packed[1::4] = pixels[1::3].translate(_QUANTIZE[1])
+        packed[2::4] = pixels[2::3].translate(_QUANTIZE[2])
+        colors = array('I', packed)
+        distinct = set(colors)
+    ordered = sorted(distinct)
+    lookup = {color: i for i, color in enumerate(ordered)}
+    palette = b"".join(color.to_bytes(4, "little")[:3] for color in ordered)
+    return palette, bytes(map(lookup.__getitem__, colors))
+
+
+def lzw_encode(indices, min_code_size):
+    # GIF flavoured LZW: variable code width up to 12 bits, packed LSB first,
+    # the table is reset with a clear code when it fills up
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    bits = 0
+    bit_count = 0
+    code_size = min_code_size + 1
+    next_code = end + 1
+    table = {}
+
+    bits |= clear << bit_count
+    bit_count += code_size
+    prefix = indices[0]
+    for k in indices[1:]:
+        key = prefix << 8 | k
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << bit_count
+        bit_count += code_size
+        while bit_count >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            bit_count -= 8
+        table[key] = next_code
+        if next_code == 1 << code_size:
+            code_size += 1
+        next_code += 1
+        if next_code == 4096: # Table full: start over
+            bits |= clear << bit_count
+            bit_count += code_size
+            table = {}
+            code_size = min_code_size + 1
+            next_code = end + 1
+        prefix = k
+    for code in (prefix, end):
+        bits |= code << bit_count
+        bit_count += code_size
+    while bit_count > 0:
+        out.append(bits & 0xFF)
+        bits >>= 8
+        bit_count -= 8
+    return bytes(out)
+
+
+def encode_gif_frame(width, height, pixels, delay_cs):
+    palette, indices = palettize(pixels)
+    table_bits = max(1, (len(palette) // 3 - 1).bit_length()) # Color table holds 2**table_bits entries
+    palette += bytes(3 * (1 << table_bits) - len(palette))
+    min_code_size = max(2, table_bits)
+    data = lzw_encode(indices, min_code_size)
+    blocks = b"".join(bytes((len(data[i:i + 255]),)) + data[i:i + 255] for i in range(0, len(data), 255))
+    return (b"\x21\xf9\x04\x04" + delay_cs.to_bytes(2, "little") + b"\x00\x00" # Graphic control: delay
+            + b"\x2c\x00\x00\x00\x00" + width.to_bytes(2, "little") + height.to_bytes(2, "little")
+            + bytes((0x80 | (table_bits - 1),)) + palette                     # Local color table
+            + bytes((min_code_size,)) + blocks + b"\x00")
+
+
+# --- Worker ---
+def render_frame(job):
+    # Runs in a pool process: rasterize one display list and encode it
+    canvas, fmt, delay_cs = job
+    pixels = headless.rasterize(canvas)
+    if fmt == "gif":
+        return encode_gif_frame(canvas.width, canvas.height, pixels, delay_cs)
+    if fmt == "png":
+        return headless.encode_png(canvas.width, canvas.height, pixels)
+    if fmt == "ppm":
+        return b"P6\n%d %d\n255\n" % (canvas.width, canvas.height) + bytes(pixels)
+    return bytes(pixels)
+
+
+def bounded_map(executor, func, jobs, max_in_flight):
+    # Like executor.map, but pulls from `jobs` lazily: never more than
+    # `max_in_flight` submitted and unconsumed results at a time
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(func, job))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# --- Export ---
+def export(scene, path, duration, fps, step_hz, fmt=None, workers=None, progress=None):
+    # Returns the number of frames written
+    fmt = fmt or guess_format(path)
+    if fmt not in FORMATS:
+        raise ValueError("unknown export format: %r" % fmt)
+    frame_count = max(1, round(duration * fps))
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+
+    def jobs():
+        for i, canvas in enumerate(display_lists(scene, frame_count, fps, step_hz)):
+            # GIF delays are in 1/100 s; spread the rounding over the frames
+            delay_cs = round((i + 1) * 100 / fps) - round(i * 100 / fps)
+            yield canvas, fmt, delay_cs
+
+    if fmt in ("png", "ppm"):
+        os.makedirs(path, exist_ok=True)
+        out = None
+    elif path == "-":
+        out = sys.stdout.buffer
+    else:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        out = open(path, "wb")
+
+    written = 0
+    try:
+        if fmt == "gif":
+            out.write(gif_header(scene.screen.getcanvas().width, scene.screen.getcanvas().height))
+        if workers == 1:
+            results = map(render_frame, jobs())
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = bounded_map(executor, render_frame, jobs(), max_in_flight)
+        try:
+            for data in results:
+                written += 1
+                if out is None:
+                    with open(os.path.join(path, "frame_%06d.%s" % (written, fmt)), "wb") as f:
+                        f.write(data)
+                else:
+                    out.write(data)
+                if progress:
+                    progress(written, frame_count)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        if fmt == "gif":
+            out.write(GIF_TRAILER)
+    finally:
+        if out is not None and out is not sys.stdout.buffer:
+            out.close()
+    return written
@@ -0,0 +1,1010 @@
+import heapq
+import math
+import os
+import re
+import struct
+import time
+import tkinter
+import turtle
+import zlib
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError: # Optional: without Pillow text is measured but not painted
+    ImageFont = None
+
+# Headless backend for the turtle scene.
+#
+# turtle.py talks to Tk only through TurtleScreenBase, which in turn only uses
+# a small set of Canvas methods. HeadlessCanvas implements that subset and
+# keeps every canvas item in memory, so the normal turtle code (circle, fills,
+# dots, clear...) runs unchanged against it. Frames are rasterized on demand
+# into an RGB pixel buffer and can be written out as PPM or PNG. Text is
+# painted only when Pillow and a CJK font are available (see Text below).
+
+# --- Colors ---
+# Tk's color names: the X11 table plus the web colors Tk 8.6 adds. Names are
+# matched without case or spaces, and "grey" is accepted for "gray". One line
+# per name: its value, then those of name1 to name4 where Tk has them.
+_COLOR_TABLE = """
+aliceblue f0f8ff
+antiquewhite faebd7 ffefdb eedfcc cdc0b0 8b8378
+aqua 00ffff
+aquamarine 7fffd4 7fffd4 76eec6 66cdaa 458b74
+azure f0ffff f0ffff e0eeee c1cdcd 838b8b
+beige f5f5dc
+bisque ffe4c4 ffe4c4 eed5b7 cdb79e 8b7d6b
+black 000000
+blanchedalmond ffebcd
+blue 0000ff 0000ff 0000ee 0000cd 00008b
+blueviolet 8a2be2
+brown a52a2a ff4040 ee3b3b cd3333 8b2323
+burlywood deb887 ffd39b eec591 cdaa7d 8b7355
+cadetblue 5f9ea0 98f5ff 8ee5ee 7ac5cd 53868b
+chartreuse 7fff00 7fff00 76ee00 66cd00 458b00
+chocolate d2691e ff7f24 ee7621 cd661d 8b4513
+coral ff7f50 ff7256 ee6a50 cd5b45 8b3e2f
+cornflowerblue 6495ed
+cornsilk fff8dc fff8dc eee8cd cdc8b1 8b8878
+crimson dc143c
+cyan 00ffff 00ffff 00eeee 00cdcd 008b8b
+darkblue 00008b
+darkcyan 008b8b
+darkgoldenrod b8860b ffb90f eead0e cd950c 8b6508
+darkgray a9a9a9
+darkgreen 006400
+darkkhaki bdb76b
+darkmagenta 8b008b
+darkolivegreen 556b2f caff70 bcee68 a2cd5a 6e8b3d
+darkorange ff8c00 ff7f00 ee7600 cd6600 8b4500
+darkorchid 9932cc bf3eff b23aee 9a32cd 68228b
+darkred 8b0000
+darksalmon e9967a
+darkseagreen 8fbc8f c1ffc1 b4eeb4 9bcd9b 698b69
+darkslateblue 483d8b
+darkslategray 2f4f4f 97ffff 8deeee 79cdcd 528b8b
+darkturquoise 00ced1
+darkviolet 9400d3
+debianred d70751
+deeppink ff1493 ff1493 ee1289 cd1076 8b0a50
+deepskyblue 00bfff 00bfff 00b2ee 009acd 00688b
+dimgray 696969
+dodgerblue 1e90ff 1e90ff 1c86ee 1874cd 104e8b
+firebrick b22222 ff3030 ee2c2c cd2626 8b1a1a
+floralwhite fffaf0
+forestgreen 228b22
+fuchsia ff00ff
+gainsboro dcdcdc
+ghostwhite f8f8ff
+gold ffd700 ffd700 eec900 cdad00 8b7500
+goldenrod daa520 ffc125 eeb422 cd9b1d 8b6914
+gray bebebe
+green 00ff00 00ff00 00ee00 00cd00 008b00
+greenyellow adff2f
+honeydew f0fff0 f0fff0 e0eee0 c1cdc1 838b83
+hotpink ff69b4 ff6eb4 ee6aa7 cd6090 8b3a62
+indianred cd5c5c ff6a6a ee6363 cd5555 8b3a3a
+indigo 4b0082
+ivory fffff0 fffff0 eeeee0 cdcdc1 8b8b83
+khaki f0e68c fff68f eee685 cdc673 8b864e
+lavender e6e6fa
+lavenderblush fff0f5 fff0f5 eee0e5 cdc1c5 8b8386
+lawngreen 7cfc00
+lemonchiffon fffacd fffacd eee9bf cdc9a5 8b8970
+lightblue add8e6 bfefff b2dfee 9ac0cd 68838b
+lightcoral f08080
+lightcyan e0ffff e0ffff d1eeee b4cdcd 7a8b8b
+lightgoldenrod eedd82 ffec8b eedc82 cdbe70 8b814c
+lightgoldenrodyellow fafad2
+lightgray d3d3d3
+lightgreen 90ee90
+lightpink ffb6c1 ffaeb9 eea2ad cd8c95 8b5f65
+lightsalmon ffa07a ffa07a ee9572 cd8162 8b5742
+lightseagreen 20b2aa
+lightskyblue 87cefa b0e2ff a4d3ee 8db6cd 607b8b
+lightslateblue 8470ff
+lightslategray 778899
+lightsteelblue b0c4de cae1ff bcd2ee a2b5cd 6e7b8b
+lightyellow ffffe0 ffffe0 eeeed1 cdcdb4 8b8b7a
+lime 00ff00
+limegreen 32cd32
+linen faf0e6
+magenta ff00ff ff00ff ee00ee cd00cd 8b008b
+maroon b03060 ff34b3 ee30a7 cd2990 8b1c62
+mediumaquamarine 66cdaa
+mediumblue 0000cd
+mediumorchid ba55d3 e066ff d15fee b452cd 7a378b
+mediumpurple 9370db ab82ff 9f79ee 8968cd 5d478b
+mediumseagreen 3cb371
+mediumslateblue 7b68ee
+mediumspringgreen 00fa9a
+mediumturquoise 48d1cc
+mediumvioletred c71585
+midnightblue 191970
+mintcream f5fffa
+mistyrose ffe4e1 ffe4e1 eed5d2 cdb7b5 8b7d7b
+moccasin ffe4b5
+navajowhite ffdead ffdead eecfa1 cdb38b 8b795e
+navy 000080
+navyblue 000080
+oldlace fdf5e6
+olive 808000
+olivedrab 6b8e23 c0ff3e b3ee3a 9acd32 698b22
+orange ffa500 ffa500 ee9a00 cd8500 8b5a00
+orangered ff4500 ff4500 ee4000 cd3700 8b2500
+orchid da70d6 ff83fa ee7ae9 cd69c9 8b4789
+palegoldenrod eee8aa
+palegreen 98fb98 9aff9a 90ee90 7ccd7c 548b54
+paleturquoise afeeee bbffff aeeeee 96cdcd 668b8b
+palevioletred db7093 ff82ab ee799f cd6889 8b475d
+papayawhip ffefd5
+peachpuff ffdab9 ffdab9 eecbad cdaf95 8b7765
+peru cd853f
+pink ffc0cb ffb5c5 eea9b8 cd919e 8b636c
+plum dda0dd ffbbff eeaeee cd96cd 8b668b
+powderblue b0e0e6
+purple a020f0 9b30ff 912cee 7d26cd 551a8b
+red ff0000 ff0000 ee0000 cd0000 8b0000
+rosybrown bc8f8f ffc1c1 eeb4b4 cd9b9b 8b6969
+royalblue 4169e1 4876ff 436eee 3a5fcd 27408b
+saddlebrown 8b4513
+salmon fa8072 ff8c69 ee8262 cd7054 8b4c39
+sandybrown f4a460
+seagreen 2e8b57 54ff9f 4eee94 43cd80 2e8b57
+seashell fff5ee fff5ee eee5de cdc5bf 8b8682
+sienna a0522d ff8247 ee7942 cd6839 8b4726
+silver c0c0c0
+skyblue 87ceeb 87ceff 7ec0ee 6ca6cd 4a708b
+slateblue 6a5acd 836fff 7a67ee 6959cd 473c8b
+slategray 708090 c6e2ff b9d3ee 9fb6cd 6c7b8b
+snow fffafa fffafa eee9e9 cdc9c9 8b8989
+springgreen 00ff7f 00ff7f 00ee76 00cd66 008b45
+steelblue 4682b4 63b8ff 5cacee 4f94cd 36648b
+tan d2b48c ffa54f ee9a49 cd853f 8b5a2b
+teal 008080
+thistle d8bfd8 ffe1ff eed2ee cdb5cd 8b7b8b
+tomato ff6347 ff6347 ee5c42 cd4f39 8b3626
+turquoise 40e0d0 00f5ff 00e5ee 00c5cd 00868b
+violet ee82ee
+violetred d02090 ff3e96 ee3a8c cd3278 8b2252
+wheat f5deb3 ffe7ba eed8ae cdba96 8b7e66
+white ffffff
+whitesmoke f5f5f5
+yellow ffff00 ffff00 eeee00 cdcd00 8b8b00
+yellowgreen 9acd32
+"""
+_GRAY_LEVELS = ( # gray0 to gray100, one hex byte each
+    "000305080a0d0f1214171a1c1f212426292b2e303336383b3d404245474a4d4f525457595c5e6163"
+    "66696b6e707375787a7d7f8285878a8c8f919496999c9ea1a3a6a8abadb0b3b5b8babdbfc2c4c7c9"
+    "cccfd1d4d6d9dbdee0e3e5e8ebedf0f2f5f7fafcff"
+)
+
+def _named_colors():
+    colors = {}
+    for line in _COLOR_TABLE.split("\n"):
+        if not line:
+            continue
+        name, *values = line.split()
+        for suffix, value in zip(("", "1", "2", "3", "4"), values):
+            colors[name + suffix] = tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    for level in range(101):
+        v = int(_GRAY_LEVELS[level * 2:level * 2 + 2], 16)
+        colors["gray%d" % level] = (v, v, v)
+    return colors
+
+NAMED_COLORS = _named_colors()
+
+_color_cache = {}
+
+def parse_color(color):
+    # Returns an (r, g, b) tuple of 0-255 ints, or None for "" (transparent)
+    if not color:
+        return None
+    rgb = _color_cache.get(color)
+    if rgb is not None:
+        return rgb
+    name = color.lower().replace(" ", "").replace("grey", "gray")
+    if name.startswith("#"):
+        digits = name[1:]
+        if len(digits) not in (3, 6, 12):
+            raise tkinter.TclError('unknown color name "%s"' % color)
+        try:
+            n = len(digits) // 3
+            r, g, b = (int(digits[i * n:(i + 1) * n], 16) for i in range(3))
+        except ValueError:
+            raise tkinter.TclError('unknown color name "%s"' % color)
+        scale = 255 / (16 ** n - 1)
+        rgb = (round(r * scale), round(g * scale), round(b * scale))
+    elif name in NAMED_COLORS:
+        rgb = NAMED_COLORS[name]
+    else:
+        raise tkinter.TclError('unknown color name "%s"' % color)
+    _color_cache[color] = rgb
+    return rgb
+
+
+def _flatten(args):
+    # Canvas methods accept coordinates either as separate numbers or as
+    # (nested) sequences, e.g. coords(item, (x, y)).
+    flat = []
+    for a in args:
+        if isinstance(a, (list, tuple)):
+            flat.extend(_flatten(a))
+        else:
+            flat.append(float(a))
+    return flat
+
+
+def _tag_list(tags):
+    if not tags:
+        return ()
+    if isinstance(tags, str):
+        return tags.split()
+    return tags
+
+
+# --- In-memory Canvas ---
+class HeadlessCanvas:
+    def __init__(self, width, height, bg="white"):
+        self.width = width
+        self.height = height
+        self.bg = bg
+        self._items = {} # id -> [type, coords, options]; dict order is the display list
+        self._tags = {}  # tag -> {id: None}
+        self._next_id = 1
+        self._timers = [] # heap of (due_ms, seq, callback)
+        self._timer_seq = 0
+        self.now_ms = 0.0 # Virtual clock, advanced by the timer loop
+        self.realtime = False # Wait for timers in real time instead (e.g. to keep pace with a thread)
+        self._epoch = None
+
+    # Configuration
+    def cget(self, option):
+        if option == "width":
+            return str(self.width)
+        if option == "height":
+            return str(self.height)
+        if option == "bg":
+            return self.bg
+        return ""
+
+    def config(self, **options):
+        if "bg" in options:
+            self.bg = options["bg"]
+        if "width" in options:
+            self.width = int(options["width"])
+        if "height" in options:
+            self.height = int(options["height"])
+
+    configure = config
+
+    def winfo_rgb(self, color):
+        r, g, b = parse_color(color) or (0, 0, 0)
+        return r * 257, g * 257, b * 257
+
+    def winfo_toplevel(self):
+        return self
+
+    def call(self, *args):
+        pass
+
+    # Items
+    def _create(self, item_type, args, options):
+        item = self._next_id
+        self._next_id += 1
+        self._items[item] = [item_type, _flatten(args), options]
+        for tag in _tag_list(options.get("tags")):
+            self._tags.setdefault(tag, {})[item] = None
+        return item
+
+    def _resolve(self, tag_or_id):
+        # Item ids matched by an id, a tag or "all", in display order
+        if tag_or_id == "all":
+            return list(self._items)
+        if isinstance(tag_or_id, int):
+            return [tag_or_id] if tag_or_id in self._items else []
+        tagged = self._tags.get(tag_or_id)
+        if not tagged:
+            return []
+        return [item for item in self._items if item in tagged] if len(tagged) > 1 else list(tagged)
+
+    def create_polygon(self, *args, **options):
+        options.setdefault("fill", "black")
+        options.setdefault("outline", "")
+        options.setdefault("width", 1)
+        return self._create("polygon", args, options)
+
+    def create_line(self, *args, **options):
+        options.setdefault("fill", "black")
+        options.setdefault("width", 1)
+        return self._create("line", args, options)
+
+    def create_oval(self, *args, **options):
+        options.setdefault("fill", "")
+        options.setdefault("outline", "black")
+        options.setdefault("width", 1)
+        return self._create("oval", args, options)
+
+    def create_rectangle(self, *args, **options):
+        options.setdefault("fill", "")
+        options.setdefault("outline", "black")
+        options.setdefault("width", 1)
+        return self._create("rectangle", args, options)
+
+    def create_text(self, *args, **options):
+        options.setdefault("fill", "black")
+        options.setdefault("anchor", "center")
+        options.setdefault("text", "")
+        return self._create("text", args, options)
+
+    def create_image(self, *args, **options):
+        options.setdefault("image", "")
+        options.setdefault("anchor", "center")
+        return self._create("image", args, options)
+
+    def coords(self, item, *args):
+        matches = self._resolve(item)
+        if not matches:
+            return []
+        entry = self._items[matches[0]]
+        if not args:
+            return list(entry[1])
+        entry[1] = _flatten(args)
+
+    def move(self, tag_or_id, dx, dy):
+        for item in self._resolve(tag_or_id):
+            cl = self._items[item][1]
+            for i in range(0, len(cl) - 1, 2):
+                cl[i] += dx
+                cl[i + 1] += dy
+
+    def itemconfigure(self, tag_or_id, **options):
+        for item in self._resolve(tag_or_id):
+            entry_options = self._items[item][2]
+            if "tags" in options:
+                self._untag(item, entry_options)
+                for tag in _tag_list(options["tags"]):
+                    self._tags.setdefault(tag, {})[item] = None
+            entry_options.update(options)
+
+    itemconfig = itemconfigure
+
+    def itemcget(self, item, option):
+        return self._items[self._resolve(item)[0]][2].get(option, "")
+
+    def type(self, item):
+        matches = self._resolve(item)
+        return self._items[matches[0]][0] if matches else None
+
+    def tag_raise(self, tag_or_id, above=None):
+        if above is not None:
+            return self._restack(tag_or_id, above, after=True)
+        for item in self._resolve(tag_or_id):
+            self._items[item] = self._items.pop(item)
+
+    def tag_lower(self, tag_or_id, below=None):
+        if below is not None:
+            return self._restack(tag_or_id, below, after=False)
+        matches = self._resolve(tag_or_id)
+        if matches:
+            rest = self._items
+            self._items = {item: rest.pop(item) for item in matches}
+            self._items.update(rest)
+
+    def _restack(self, tag_or_id, reference, after):
+        # Move the items of `tag_or_id` just above or below the reference
+        # item (for a tag: its topmost / lowest item, as Tk does)
+        anchors = self._resolve(reference)
+        if not anchors:
+            return
+        anchor = anchors[-1] if after else anchors[0]
+        moving = set(self._resolve(tag_or_id))
+        moving.discard(anchor)
+        moved = {item: entry for item, entry in self._items.items() if item in moving}
+        restacked = {}
+        for item, entry in self._items.items():
+            if item in moving:
+                continue
+            if item == anchor and not after:
+                restacked.update(moved)
+            restacked[item] = entry
+            if item == anchor and after:
+                restacked.update(moved)
+        self._items = restacked
+
+    lift = tag_raise
+    lower = tag_lower
+
+    def _untag(self, item, options):
+        for tag in _tag_list(options.get("tags")):
+            tagged = self._tags.get(tag)
+            if tagged is not None:
+                tagged.pop(item, None)
+                if not tagged:
+                    del self._tags[tag]
+
+    def delete(self, *items):
+        for tag_or_id in items:
+            if tag_or_id == "all":
+                self._items.clear()
+                self._tags.clear()
+                continue
+            for item in self._resolve(tag_or_id):
+                self._untag(item, self._items.pop(item)[2])
+
+    def find_withtag(self, tag_or_id):
+        return tuple(self._resolve(tag_or_id))
+
+    def find_all(self):
+        return tuple(self._items)
+
+    def items(self):
+        return self._items.values()
+
+    def snapshot(self):
+        # Detached copy of the display list (no tags or timers), e.g. for
+        # rasterizing a frame in another process while this canvas moves on
+        copy = HeadlessCanvas(self.width, self.height, bg=self.bg)
+        copy._items = {item: [entry[0], list(entry[1]), dict(entry[2])] for item, entry in self._items.items()}
+        copy._next_id = self._next_id
+        return copy
+
+    def bbox(self, item):
+        item_type, cl, options = self._items[item]
+        if item_type == "text":
+            width, height = text_extent(options["text"], options.get("font"))
+            x, y = cl[0], cl[1]
+            anchor = _compass(options.get("anchor", "center"))
+            x0 = x - width / 2
+            if "w" in anchor:
+                x0 = x
+            elif "e" in anchor:
+                x0 = x - width
+            y0 = y - height / 2
+            if anchor.startswith("n"):
+                y0 = y
+            elif anchor.startswith("s"):
+                y0 = y - height
+            return int(x0), int(y0), int(x0 + width), int(y0 + height)
+        xs = cl[0::2] or [0]
+        ys = cl[1::2] or [0]
+        return int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))
+
+    # Events are never delivered headless; bindings are accepted and ignored.
+    def bind(self, *args, **kwargs):
+        pass
+
+    def unbind(self, *args, **kwargs):
+        pass
+
+    def tag_bind(self, *args, **kwargs):
+        pass
+
+    def tag_unbind(self, *args, **kwargs):
+        pass
+
+    def focus_force(self):
+        pass
+
+    # Timers run on a virtual clock: nothing ever sleeps, unless `realtime`
+    # is set, in which case the clock follows perf_counter and the timer loop
+    # sleeps until the next timer is due.
+    def after(self, ms, func=None, *args):
+        if func is None:
+            self.now_ms += ms
+            return None
+        self._timer_seq += 1
+        heapq.heappush(self._timers, (self.now_ms + ms, self._timer_seq, func, args))
+        return self._timer_seq
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, timer_id):
+        self._timers = [t for t in self._timers if t[1] != timer_id]
+        heapq.heapify(self._timers)
+
+    def _real_ms(self):
+        if self._epoch is None:
+            self._epoch = time.perf_counter() - self.now_ms / 1000
+        return (time.perf_counter() - self._epoch) * 1000
+
+    def run_next_timer(self):
+        if not self._timers:
+            return False
+        due, _, func, args = heapq.heappop(self._timers)
+        if self.realtime:
+            wait = due - self._real_ms()
+            if wait > 0:
+                time.sleep(wait / 1000)
+            due = max(due, self._real_ms())
+        self.now_ms = max(self.now_ms, due)
+        func(*args)
+        return True
+
+    def run_due_timers(self):
+        # Realtime: run the timers that are due without sleeping, for an
+        # outside event loop to call periodically. Returns how many ran.
+        ran = 0
+        now = self._real_ms()
+        while self._timers and self._timers[0][0] <= now:
+            due, _, func, args = heapq.heappop(self._timers)
+            self.now_ms = max(self.now_ms, now)
+            func(*args)
+            ran += 1
+        return ran
+
+    def update(self):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+
+class HeadlessImage:
+    # Stand-in for tkinter.PhotoImage: an RGB buffer with a size.
+    def __init__(self, width=1, height=1, pixels=None):
+        self._width = width
+        self._height = height
+        self.pixels = pixels if pixels is not None else bytearray(width * height * 3)
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def blank(self):
+        self.pixels = None
+
+
+# --- Headless TurtleScreen ---
+class HeadlessScreen(turtle.TurtleScreen):
+    # A TurtleScreen drawing into a HeadlessCanvas. Besides the TurtleScreen
+    # API it provides the setup()/title() window methods of turtle.Screen so
+    # it can be swapped in for it. mainloop() drains the timer queue on the
+    # virtual clock until `frames` updates have happened, saving every
+    # `save_every`-th frame to `output_dir` when one is given. With `realtime`
+    # the timers wait for the wall clock (see HeadlessCanvas).
+    def __init__(self, width=800, height=600, frames=None, output_dir=None,
+                 save_every=1, image_format="png", realtime=False):
+        self.frame_count = 0
+        self.max_frames = frames
+        self.output_dir = output_dir
+        self.save_every = max(1, save_every)
+        self.image_format = image_format
+        self._title = ""
+        canvas = HeadlessCanvas(width, height)
+        canvas.realtime = realtime
+        turtle.TurtleScreen.__init__(self, canvas)
+
+    def _blankimage(self):
+        return HeadlessImage()
+
+    def _image(self, filename):
+        return read_image(filename)
+
+    def setup(self, width=None, height=None, startx=None, starty=None):
+        if width is not None:
+            self.cv.config(width=int(width))
+            self.canvwidth = int(width)
+        if height is not None:
+            self.cv.config(height=int(height))
+            self.canvheight = int(height)
+
+    def title(self, titlestring):
+        self._title = titlestring
+
+    def window_width(self):
+        return self.cv.width
+
+    def window_height(self):
+        return self.cv.height
+
+    def update(self):
+        turtle.TurtleScreen.update(self)
+        self.frame_count += 1
+        if self.output_dir and self.frame_count % self.save_every == 0:
+            self.save_frame(os.path.join(
+                self.output_dir, "frame_%06d.%s" % (self.frame_count, self.image_format)))
+
+    def rasterize(self):
+        return rasterize(self.cv)
+
+    def save_frame(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pixels = self.rasterize()
+        if path.endswith(".ppm"):
+            write_ppm(path, self.cv.width, self.cv.height, pixels)
+        else:
+            write_png(path, self.cv.width, self.cv.height, pixels)
+
+    def mainloop(self):
+        while self.max_frames is None or self.frame_count < self.max_frames:
+            if not self.cv.run_next_timer():
+                break
+
+    def pump(self):
+        # One non-blocking pass of the (realtime) timer loop, in place of
+        # mainloop(); returns False once the loop would have ended
+        if self.max_frames is not None and self.frame_count >= self.max_frames:
+            return False
+        self.cv.run_due_timers()
+        return bool(self.cv._timers)
+
+
+# --- Text ---
+# Text needs Pillow and a font with the captions' CJK glyphs: the file named
+# by TURTLE_HOME_FONT, else the first of FONT_FILES that exists. Tk font
+# families are not matched; every text item is drawn in that one font at its
+# size (in pixels). Without them text is measured approximately, as a
+# proportional font with East Asian wide characters a full em wide, and left
+# unpainted.
+FONT_FILES = (
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/usr/share/fonts/wenquanyi/wqy-microhei/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/System/Library/Fonts/STHeiti Light.ttc",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:/Windows/Fonts/simhei.ttf",
+    "C:/Windows/Fonts/msyh.ttc",
+)
+
+_font_file = False # Looked up on first use; None when text cannot be painted
+_fonts = {} # Pixel size -> Pillow font
+
+def text_font_file():
+    global _font_file
+    if _font_file is False:
+        _font_file = None
+        if ImageFont is not None:
+            candidates = (os.environ.get("TURTLE_HOME_FONT"),) + FONT_FILES
+            _font_file = next((path for path in candidates if path and os.path.isfile(path)), None)
+    return _font_file
+
+
+def can_paint_text():
+    return text_font_file() is not None
+
+
+def _font_size(font):
+    if font and len(font) > 1:
+        return abs(int(font[1]))
+    return 10
+
+
+def _text_font(size):
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = ImageFont.truetype(text_font_file(), size)
+    return font
+
+
+def text_extent(text, font=None):
+    size = _font_size(font)
+    if can_paint_text():
+        face = _text_font(size)
+        ascent, descent = face.getmetrics()
+        lines = text.split("\n")
+        return max(face.getlength(line) for line in lines), (ascent + descent) * len(lines)
+    width = 0.0
+    for ch in text:
+        width += size if ord(ch) >= 0x1100 else size * 0.6
+    return width, size * 1.4
+
+
+# --- Rasterizer ---
+# Primitives paint into `buf`, the window (left, top, width, height) of a
+# possibly larger picture. Points are in picture coordinates, so a tile
+# samples exactly the pixels the whole picture would.
+def _fill_polygon(buf, width, height, points, rgb, left=0, top=0):
+    # Even-odd scanline fill, sampling at pixel centres.
+    n = len(points)
+    if n < 3:
+        return
+    ys = [p[1] for p in points]
+    y_start = max(top, int(min(ys) + 0.5))
+    y_end = min(top + height - 1, int(max(ys) - 0.5))
+    if y_start > y_end:
+        return
+    edges = []
+    for i in range(n):
+        x0, y0 = points[i]
+        x1, y1 = points[(i + 1) % n]
+        if y0 == y1:
+            continue
+        if y0 > y1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        edges.append((y0, y1, x0, (x1 - x0) / (y1 - y0)))
+    color = bytes(rgb)
+    stride = width * 3
+    for y in range(y_start, y_end + 1):
+        sy = y + 0.5
+        xs = sorted(x0 + (sy - ey0) * slope for ey0, ey1, x0, slope in edges if ey0 <= sy < ey1)
+        for i in range(0, len(xs) - 1, 2):
+            a = max(left, int(xs[i] + 0.5))
+            b = min(left + width, int(xs[i + 1] + 0.5))
+            if b > a:
+                row = (y - top) * stride - left * 3
+                buf[row + a * 3:row + b * 3] = color * (b - a)
+
+
+def _fill_disk(buf, width, height, cx, cy, radius, rgb, left=0, top=0):
+    color = bytes(rgb)
+    stride = width * 3
+    r2 = radius * radius
+    y_start = max(top, int(cy - radius))
+    y_end = min(top + height - 1, int(cy + radius))
+    for y in range(y_start, y_end + 1):
+        dy = y + 0.5 - cy
+        if dy * dy > r2:
+            continue
+        half = (r2 - dy * dy) ** 0.5
+        a = int(cx - half + 0.5)
+        b = int(cx + half + 0.5)
+        if b <= a:
+            a = math.floor(cx) # Always paint at least the centre pixel
+            b = a + 1
+        a = max(left, a)
+        b = min(left + width, b)
+        if b > a:
+            row = (y - top) * stride - left * 3
+            buf[row + a * 3:row + b * 3] = color * (b - a)
+
+
+def _draw_thin_line(buf, width, height, x0, y0, x1, y1, rgb, left=0, top=0):
+    steps = int(max(abs(x1 - x0), abs(y1 - y0))) + 1
+    dx = (x1 - x0) / steps
+    dy = (y1 - y0) / steps
+    stride = width * 3
+    color = bytes(rgb)
+    x, y = x0, y0
+    for _ in range(steps + 1):
+        px = math.floor(x)
+        py = math.floor(y)
+        if left <= px < left + width and top <= py < top + height:
+            i = (py - top) * stride + (px - left) * 3
+            buf[i:i + 3] = color
+        x += dx
+        y += dy
+
+
+def _draw_polyline(buf, width, height, points, line_width, rgb, round_caps, left=0, top=0):
+    if line_width <= 1.5:
+        if len(points) == 1:
+            points = points * 2
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            _draw_thin_line(buf, width, height, x0, y0, x1, y1, rgb, left, top)
+        return
+    half = line_width / 2
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
+        if length == 0:
+            continue
+        nx = -(y1 - y0) / length * half
+        ny = (x1 - x0) / length * half
+        _fill_polygon(buf, width, height,
+                      ((x0 + nx, y0 + ny), (x1 + nx, y1 + ny), (x1 - nx, y1 - ny), (x0 - nx, y0 - ny)), rgb, left, top)
+    if round_caps:
+        for x, y in points:
+            _fill_disk(buf, width, height, x, y, half, rgb, left, top)
+
+
+def _compass(anchor):
+    # Tk anchors are compass points; "center" has no n/s/e/w component
+    return "" if anchor == "center" else anchor
+
+
+def _blit(buf, width, height, image, x, y, anchor, left=0, top=0):
+    if image.pixels is None:
+        return
+    anchor = _compass(anchor)
+    iw, ih = image.width(), image.height()
+    x0 = x - iw / 2
+    y0 = y - ih / 2
+    if "w" in anchor:
+        x0 = x
+    elif "e" in anchor:
+        x0 = x - iw
+    if anchor.startswith("n"):
+        y0 = y
+    elif anchor.startswith("s"):
+        y0 = y - ih
+    x0, y0 = int(x0), int(y0)
+    a = max(left, x0)
+    b = min(left + width, x0 + iw)
+    if b <= a:
+        return
+    for row in range(max(top, y0), min(top + height, y0 + ih)):
+        src = ((row - y0) * iw + (a - x0)) * 3
+        dst = ((row - top) * width + (a - left)) * 3
+        buf[dst:dst + (b - a) * 3] = image.pixels[src:src + (b - a) * 3]
+
+
+def _paint_text(buf, width, height, x, y, options, rgb, scale, left=0, top=0):
+    # Antialiased text through a Pillow mask, blended into just the rows and
+    # columns it covers
+    text = options.get("text", "")
+    if not text.strip():
+        return
+    face = _text_font(max(1, round(_font_size(options.get("font")) * scale)))
+    ascent, descent = face.getmetrics()
+    lines = text.split("\n")
+    line_widths = [face.getlength(line) for line in lines]
+    tw = math.ceil(max(line_widths))
+    th = (ascent + descent) * len(lines)
+    anchor = _compass(options.get("anchor", "center"))
+    x0 = x - tw / 2
+    y0 = y - th / 2
+    if "w" in anchor:
+        x0 = x
+    elif "e" in anchor:
+        x0 = x - tw
+    if anchor.startswith("n"):
+        y0 = y
+    elif anchor.startswith("s"):
+        y0 = y - th
+    x0, y0 = round(x0), round(y0)
+    a, b = max(left, x0), min(left + width, x0 + tw)
+    r0, r1 = max(top, y0), min(top + height, y0 + th)
+    if b <= a or r1 <= r0:
+        return
+    mask = Image.new("L", (tw, th))
+    draw = ImageDraw.Draw(mask)
+    justify = options.get("justify", "left")
+    for i, (line, line_width) in enumerate(zip(lines, line_widths)):
+        shift = 0 if justify == "left" else (tw - line_width) / (2 if justify == "center" else 1)
+        draw.text((shift, i * (ascent + descent)), line, fill=255, font=face)
+    stride = width * 3
+    rows = range(r0 - top, r1 - top)
+    region = Image.frombytes("RGB", (b - a, r1 - r0), b"".join(
+        buf[row * stride + (a - left) * 3:row * stride + (b - left) * 3] for row in rows))
+    region.paste(tuple(rgb), (0, 0), mask.crop((a - x0, r0 - y0, b - x0, r1 - y0)))
+    data = region.tobytes()
+    span = (b - a) * 3
+    for i, row in enumerate(rows):
+        buf[row * stride + (a - left) * 3:row * stride + (b - left) * 3] = data[i * span:(i + 1) * span]
+
+
+def rasterize(canvas, width=None, height=None, scale=1.0, origin=None, left=0, top=0):
+    # Paint every item of `canvas` in display-list order into a new RGB
+    # buffer. Canvas coordinates are centred on the origin, as turtle uses them.
+    # `scale` magnifies coordinates and line widths and `origin` is where the
+    # canvas origin lands in the picture (default: its centre). With `left`
+    # and `top` the buffer is just the width x height window of a larger
+    # picture at that offset, i.e. one tile. Items entirely outside the
+    # window are skipped. Images are placed but not scaled; text is scaled
+    # and painted when can_paint_text().
+    width = width or canvas.width
+    height = height or canvas.height
+    paint_text = can_paint_text()
+    ox, oy = origin if origin is not None else (width / 2, height / 2)
+    buf = bytearray(bytes(parse_color(canvas.bg) or (255, 255, 255)) * (width * height))
+    for item_type, cl, options in canvas.items():
+        if not cl or options.get("state") == "hidden":
+            continue
+        points = [(cl[i] * scale + ox, cl[i + 1] * scale + oy) for i in range(0, len(cl) - 1, 2)]
+        line_width = float(options.get("width", 1)) * scale
+        if item_type not in ("image", "text"): # Those reach beyond their anchor point
+            reach = line_width + 1
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            if (min(xs) > left + width + reach or max(xs) < left - reach
+                    or min(ys) > top + height + reach or max(ys) < top - reach):
+                continue
+        if item_type == "polygon":
+            fill = parse_color(options.get("fill"))
+            if fill:
+                _fill_polygon(buf, width, height, points, fill, left, top)
+            outline = parse_color(options.get("outline"))
+            if outline:
+                _draw_polyline(buf, width, height, points + points[:1], line_width, outline, False, left, top)
+        elif item_type == "line":
+            fill = parse_color(options.get("fill"))
+            if fill:
+                _draw_polyline(buf, width, height, points, line_width,
+                               fill, options.get("capstyle") == "round", left, top)
+        elif item_type in ("oval", "rectangle") and len(points) >= 2:
+            (x0, y0), (x1, y1) = points[0], points[1]
+            if item_type == "rectangle":
+                outline_points = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+            else:
+                cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+                rx, ry = abs(x1 - x0) / 2, abs(y1 - y0) / 2
+                segments = max(12, int(max(rx, ry)))
+                outline_points = [(cx + rx * math.cos(2 * math.pi * i / segments),
+                                   cy + ry * math.sin(2 * math.pi * i / segments))
+                                  for i in range(segments)]
+            fill = parse_color(options.get("fill"))
+            if fill:
+                _fill_polygon(buf, width, height, outline_points, fill, left, top)
+            outline = parse_color(options.get("outline"))
+            if outline:
+                _draw_polyline(buf, width, height, outline_points + outline_points[:1], line_width, outline, False, left, top)
+        elif item_type == "image":
+            image = options.get("image")
+            if isinstance(image, HeadlessImage):
+                _blit(buf, width, height, image, points[0][0], points[0][1], options.get("anchor", "center"), left, top)
+        elif item_type == "text" and paint_text:
+            fill = parse_color(options.get("fill"))
+            if fill:
+                _paint_text(buf, width, height, points[0][0], points[0][1], options, fill, scale, left, top)
+    return buf
+
+
+# --- Image Files ---
+def write_ppm(path, width, height, pixels):
+    with open(path, "wb") as f:
+        f.write(b"P6\n%d %d\n255\n" % (width, height))
+        f.write(pixels)
+
+
+def _png_chunk(tag, data):
+    return (struct.pack(">I", len(data)) + tag + data
+            + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+
+def _png_signature(width, height):
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0) # 8-bit RGB
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+
+
+def encode_png(width, height, pixels):
+    stride = width * 3
+    raw = b"".join(b"\x00" + bytes(pixels[y * stride:(y + 1) * stride]) for y in range(height))
+    return (_png_signature(width, height)
+            + _png_chunk(b"IDAT", zlib.compress(raw, 6)) + _png_chunk(b"IEND", b""))
+
+
+class PNGWriter:
+    # Writes a PNG to an open binary file a few rows at a time, so an image
+    # never has to exist in memory as a whole. Rows must come top to bottom.
+    def __init__(self, f, width, height, level=6):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._compressor = zlib.compressobj(level)
+        f.write(_png_signature(width, height))
+
+    def write_rows(self, pixels):
+        # `pixels`: RGB bytes of one or more whole rows
+        stride = self.width * 3
+        count = len(pixels) // stride
+        raw = b"".join(b"\x00" + bytes(pixels[y * stride:(y + 1) * stride]) for y in range(count))
+        self._write_idat(self._compressor.compress(raw))
+        self.rows += count
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError("PNG has %d rows, %d were written" % (self.height, self.rows))
+        self._write_idat(self._compressor.flush())
+        self.f.write(_png_chunk(b"IEND", b""))
+
+    def _write_idat(self, data):
+        if data:
+            self.f.write(_png_chunk(b"IDAT", data))
+
+
+def write_png(path, width, height, pixels):
+    with open(path, "wb") as f:
+        f.write(encode_png(width, height, pixels))
+
+
+def read_image(filename):
+    # Only binary PPM is understood headless (it is what write_ppm produces).
+    with open(filename, "rb") as f:
+        data = f.read()
+    match = re.match(rb"P6\s+(\d+)\s+(\d+)\s+(\d+)\s", data)
+    if match is None:
+        raise turtle.TurtleGraphicsError("headless backend can only load P6 PPM images: %s" % filename)
+    width, height = int(match.group(1)), int(match.group(2))
+    start = match.end()
+    return HeadlessImage(width, height, bytearray(data[start:start + width * height * 3]))
@@ -1,84 +1,144 @@
 import turtle
+import tkinter
 import random
 import colorsys # For color manipulation if needed
+import argparse
+import os
+import sys
+import time
+import asyncio
+
+import headless
+from particles import SmokeLayer
+from caption import Caption
+import sprites
+from scheduler import FixedStepScheduler
+from profiler import FrameProfiler, PerformanceHUD
+from quality import QualityController
+import background
+import export
+import poster
+import simulation
+import simworker
+import village
+import scenefile
+import canvaspen
+from captionfeed import CaptionFeed
+from particles import counter_hash
+
+# --- Command Line Options ---
+def poster_size(text):
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected WIDTHxHEIGHT, e.g. 7200x5400")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError("poster size must be positive")
+    return width, height
+
+
+def parse_options(argv):
+    parser = argparse.ArgumentParser(description="爱是日常，也是远方")
+    parser.add_argument("--headless", action="store_true",
+                        default=os.environ.get("TURTLE_HOME_HEADLESS", "") not in ("", "0"),
+                        help="render offscreen without a Tk window (or set TURTLE_HOME_HEADLESS=1)")
+    parser.add_argument("--frames", type=int, default=int(os.environ.get("TURTLE_HOME_FRAMES", 100)),
+                        help="headless: number of frames to render before exiting")
+    parser.add_argument("--out", default=None,
+                        help="headless: directory to write rendered frames to (captions need Pillow and a CJK font)")
+    parser.add_argument("--save-every", type=int, default=1,
+                        help="headless: only write every N-th frame")
+    parser.add_argument("--fps", type=float, default=20,
+                        help="target frames per second, at most the simulation rate of %d "
+                             "(animation speed is unaffected)" % SIMULATION_HZ)
+    parser.add_argument("--hud", action="store_true",
+                        help="show per-stage frame timings (p50/p95/max) on screen")
+    parser.add_argument("--profile-csv", default=None,
+                        help="write per-frame stage timings to this CSV file")
+    parser.add_argument("--cache-background", action="store_true",
+                        help="render the static scene once into a single background image")
+    parser.add_argument("--max-smoke", type=int, default=60,
+                        help="capacity of the smoke particle ring buffer")
+    parser.add_argument("--format", choices=("png", "ppm"), default="png",
+                        help="headless: image format for written frames")
+    parser.add_argument("--adaptive", choices=("auto", "on", "off"), default="auto",
+                        help="lower the scene's detail when frames exceed the budget "
+                             "(auto: on in a window, off headless so renders are reproducible)")
+    parser.add_argument("--frame-budget", type=float, default=None,
+                        help="adaptive: frame time budget in ms (default: 1000 / --fps)")
+    parser.add_argument("--simulation", choices=("inline",) + tuple(simworker.WORKERS), default="inline",
+                        help="where the simulation runs: on the Tk main thread between frames, or on a "
+                             "worker thread/process in real time while frames draw its newest snapshot "
+                             "(headless runs then pace frames in real time and are not reproducible)")
+    parser.add_argument("--village", type=int, default=0, metavar="CABINS",
+                        help="replace the single cabin with a village of this many cabins, "
+                             "panned across by the camera")
+    parser.add_argument("--backend", choices=canvaspen.BACKENDS, default="turtle",
+                        help="how the drawing helpers draw: through turtle, or straight onto the canvas "
+                             "with one item per shape (faster builds, same picture)")
+    parser.add_argument("--scene", default=None, metavar="FILE",
+                        help="build the static scene from a JSON/TOML scene file (e.g. home.json) "
+                             "instead of the built-in layout")
+    parser.add_argument("--scene-cache", default=None, metavar="DIR",
+                        help="where compiled scene files are cached (default: ~/.cache/turtle_home/scenes)")
+    parser.add_argument("--caption-socket", default=None, metavar="PATH",
+                        help="accept live captions, one line each, on this Unix socket")
+    parser.add_argument("--caption-fifo", default=None, metavar="PATH",
+                        help="accept live captions, one line each, from this named pipe (created if missing)")
+    parser.add_argument("--caption-queue", type=int, default=8,
+                        help="live captions waiting to be shown before senders are held back")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the trees and smoke; the same seed renders the same frames")
+    parser.add_argument("--export", default=None, metavar="PATH",
+                        help="render offscreen to an animated .gif, a .rgb stream (- for stdout) "
+                             "or a directory of frames, then exit (captions need Pillow and a CJK font)")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="export: seconds of animation to render")
+    parser.add_argument("--export-format", choices=export.FORMATS, default=None,
+                        help="export: output format (default: from the path)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="export/poster: worker processes (default: one per CPU)")
+    parser.add_argument("--poster", default=None, metavar="PATH",
+                        help="render one frame at poster size to a .png or .ppm file, then exit "
+                             "(the caption needs Pillow and a CJK font)")
+    parser.add_argument("--poster-size", type=poster_size, default=(7200, 5400), metavar="WxH",
+                        help="poster: output size in pixels (the scene is scaled to fit)")
+    parser.add_argument("--poster-frame", type=int, default=100,
+                        help="poster: simulation step to show")
+    parser.add_argument("--tile-size", type=int, default=512,
+                        help="poster: tile edge in pixels; one row of tiles is held at a time "
+                             "(poster width x tile size x 3 bytes)")
+    options = parser.parse_args(argv)
+    if not 0 < options.fps <= SIMULATION_HZ:
+        parser.error("--fps must be above 0 and at most %d: frames beyond the simulation rate "
+                     "would show nothing new" % SIMULATION_HZ)
+    if options.max_smoke < 1:
+        parser.error("--max-smoke must be at least 1")
+    if options.tile_size < 1:
+        parser.error("--tile-size must be at least 1")
+    if options.caption_queue < 1:
+        parser.error("--caption-queue must be at least 1: an unbounded queue never holds senders back")
+    if options.village < 0:
+        parser.error("--village must be 0 (the single cabin) or more cabins")
+    if options.village and options.scene:
+        parser.error("--village cannot be combined with --scene: the scene file lays out its own cabin")
+    return options
 
 # --- Screen Setup ---
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-screen = turtle.Screen()
-screen.setup(width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
-screen.bgcolor("#E0F7FA") # Light cyan - a soft sky color
-screen.title("爱是日常，也是远方")
-screen.tracer(0)
-
-# --- Turtle Pens ---
-pen = turtle.Turtle() # For static elements
-pen.speed(0)
-pen.hideturtle()
-pen.penup()
-
-smoke_pen = turtle.Turtle() # For dynamic smoke
-smoke_pen.speed(0)
-smoke_pen.hideturtle()
-smoke_pen.penup()
-
-sun_effects_pen = turtle.Turtle() # For sun rays
-sun_effects_pen.speed(0)
-sun_effects_pen.hideturtle()
-sun_effects_pen.penup()
-
-couple_pen = turtle.Turtle() # For the moving couple
-couple_pen.speed(0)
-couple_pen.hideturtle()
-couple_pen.penup()
-
-text_pen = turtle.Turtle() # For writing text
-text_pen.speed(0)
-text_pen.hideturtle()
-text_pen.penup()
-text_pen.pencolor("darkslateblue") # Default text color
-
-# --- Global Smoke Particle List ---
-smoke_particles = []
-SMOKE_START_X = 0 # Will be updated after cabin is drawn
-SMOKE_START_Y = 0
-SMOKE_CREATION_INTERVAL = 5 # Create smoke every N frames
-smoke_frame_count = 0
-
-# --- Global Window Light Details ---
-cabin_window_details = {
-    'x': 0, 'y': 0, 'size': 0,
-    'colors': ["#FFFFE0", "#FFEEB0"], # LightYellow, Slightly dimmer/warmer yellow
-    'current_color_index': 0,
-    'border_color': "black",
-    'pane_color': "saddlebrown"
-}
-WINDOW_FLICKER_INTERVAL = 15 # Flicker every N frames (e.g., 15 frames = 0.75 seconds at 20FPS)
-window_frame_count = 0
-
-# --- Global Sun Details for Animation ---
-sun_details = {
-    'x': 0, 'y': 0, 'radius': 0, 'color': "gold", # Will be populated
-    'ray_color': "#FFFFA0", # Light yellow for rays
-    'num_rays': 12,
-    'ray_length_short': 7,
-    'ray_length_long': 12,
-    'current_ray_length': 12
-}
-SUN_RAY_FLICKER_INTERVAL = 8 # Flicker rays every N frames
-sun_ray_frame_count = 0
-
-# --- Global Couple Animation Details ---
-# couple_pen is defined with other pens now
-couple_current_x = 0 # Will be initialized in main logic
-couple_current_y = 0 # Will be ground_level_y
-couple_min_x = 0     # Movement range min X
-couple_max_x = 0     # Movement range max X
-couple_dx = 0.5      # Movement speed and direction (pixels per frame)
+SKY_COLOR = "#E0F7FA" # Light cyan - a soft sky color
+WINDOW_TITLE = "爱是日常，也是远方"
+
+# Animation timings live with the simulation (see simulation.py)
+
+# --- Window Light ---
+WINDOW_LIGHT_COLORS = ["#FFFFE0", "#FFEEB0"] # LightYellow, Slightly dimmer/warmer yellow
+
+# --- Couple ---
 COUPLE_SCALE = 0.8   # Scale of the couple
-COUPLE_MOVEMENT_RANGE = 60 # Total range of horizontal movement
 
-# --- Global Text Animation Details ---
+# --- Text Animation ---
 CAPTION_TEXTS = [
     "每一帧，都是生活的小确幸",
     "光阴的故事，由我们慢慢书写。",
@@ -86,16 +146,31 @@ CAPTION_TEXTS = [
     "世界很大，幸福很小，藏在这屋檐下。",
     "看庭前花开花落，望天上云卷云舒。"
 ]
-current_caption_list_index = 0
-displayed_text = ""
-current_char_index = 0
-TEXT_ANIMATION_INTERVAL = 5 # Frames per character (slower)
-text_animation_frame_count = 0
 TEXT_Y_POSITION = -SCREEN_HEIGHT / 2 + 30
 TEXT_FONT = ("SimHei", 16, "normal")
-TEXT_HOLD_INTERVAL = 30 # Frames to hold text after full display (5s at 20FPS)
-text_hold_frame_count = 0
-# text_pen is already defined
+TEXT_COLOR = "darkslateblue"
+LIVE_CAPTION_SLOTS = 2 # Live captions alternate between these, so one can queue while the other shows
+
+# --- Event Loop ---
+TK_PUMP_INTERVAL = 0.004 # Seconds between Tk event passes when asyncio runs the loop
+
+# --- Village ---
+VILLAGE_SLOT_WIDTH = 480 # One cabin with its trees and fences
+VILLAGE_TREE_VARIANTS = 4
+VILLAGE_WALL_TINTS = ["#FFFFFF", "#FFE4B5", "#BC8F8F", "#708090", "#F4A460"]
+VILLAGE_CROWN_TINTS = ["#006400", "#6B8E23", "#2E8B57"]
+
+# --- Frame Scheduling ---
+SIMULATION_HZ = 20 # Step rate all the per-step timings were tuned for
+
+# --- Offscreen Output ---
+# The headless rasterizer paints text only with Pillow and a CJK font (see
+# headless.py); without them offscreen output has no captions, so say so
+NO_TEXT_WARNING = ("warning: %s without the captions: painting text headless needs Pillow "
+                   "and a CJK font (set TURTLE_HOME_FONT to a font file)")
+
+# --- Poster ---
+POSTER_CIRCLE_STEPS = 360 # Circles are polylines; at poster scale they need many more steps
 
 # --- Helper: Draw a filled rectangle ---
 def draw_filled_rectangle(t, x, y, width, height, border_color, fill_color):
@@ -114,7 +189,7 @@ def draw_filled_rectangle(t, x, y, width, height, border_color, fill_color):
     t.penup()
 
 # --- Draw Sun ---
-def draw_sun(t, x, y, radius, color):
+def draw_sun(t, x, y, radius, color, steps=None):
     original_heading = t.heading()
     original_pencolor = t.pencolor()
     original_fillcolor = t.fillcolor()
@@ -124,181 +199,109 @@ def draw_sun(t, x, y, radius, color):
     t.pencolor(color)
     t.fillcolor(color)
     t.begin_fill()
-    t.circle(radius)
+    t.circle(radius, steps=steps) # None: turtle picks the step count from the radius
     t.end_fill()
     t.pencolor(original_pencolor)
     t.fillcolor(original_fillcolor)
     t.setheading(original_heading)
     t.penup()
 
+
 # --- Draw Cabin ---
-def draw_cabin(base_x, base_y):
+# Returns the cabin width, the top of the chimney (where smoke starts) and the
+# window rectangle (x, y, size), which the scene keeps as a retained layer.
+def draw_cabin(t, base_x, base_y):
     wall_color = "#DEB887"
     roof_color = "#A0522D"
     door_color = "#8B4513"
-    window_light_color = "#FFFFE0"
     chimney_color = "#8B7355"
     cabin_width = 150
     cabin_height = 100
     roof_height = 60
-    draw_filled_rectangle(pen, base_x, base_y, cabin_width, cabin_height, "black", wall_color)
-    pen.penup()
-    pen.goto(base_x - 10, base_y + cabin_height)
-    pen.pendown()
-    pen.pencolor("black")
-    pen.fillcolor(roof_color)
-    pen.begin_fill()
-    pen.goto(base_x + cabin_width / 2, base_y + cabin_height + roof_height)
-    pen.goto(base_x + cabin_width + 10, base_y + cabin_height)
-    pen.goto(base_x - 10, base_y + cabin_height)
-    pen.end_fill()
-    pen.penup()
+    draw_filled_rectangle(t, base_x, base_y, cabin_width, cabin_height, "black", wall_color)
+    t.penup()
+    t.goto(base_x - 10, base_y + cabin_height)
+    t.pendown()
+    t.pencolor("black")
+    t.fillcolor(roof_color)
+    t.begin_fill()
+    t.goto(base_x + cabin_width / 2, base_y + cabin_height + roof_height)
+    t.goto(base_x + cabin_width + 10, base_y + cabin_height)
+    t.goto(base_x - 10, base_y + cabin_height)
+    t.end_fill()
+    t.penup()
     door_width = 30
     door_height = 50
-    draw_filled_rectangle(pen, base_x + cabin_width / 2 - door_width / 2, base_y, door_width, door_height, "black", door_color)
-    pen.goto(base_x + cabin_width / 2 - door_width / 2 + 5, base_y + door_height / 2)
-    pen.dot(5, "gold")
+    draw_filled_rectangle(t, base_x + cabin_width / 2 - door_width / 2, base_y, door_width, door_height, "black", door_color)
+    t.goto(base_x + cabin_width / 2 - door_width / 2 + 5, base_y + door_height / 2)
+    t.dot(5, "gold")
     window_size = 25
     window_x = base_x + cabin_width * 0.7 - window_size / 2
     window_y = base_y + cabin_height * 0.5
-    
-    # Store window details for animation
-    global cabin_window_details # Ensure we are modifying the global dict
-    cabin_window_details['x'] = window_x
-    cabin_window_details['y'] = window_y
-    cabin_window_details['size'] = window_size
-    # cabin_window_details['border_color'] and ['pane_color'] are already set globally
-    # cabin_window_details['colors'] and ['current_color_index'] are also set globally
-
-    # Initial draw of the window using details from the global dict
-    initial_light_color = cabin_window_details['colors'][cabin_window_details['current_color_index']]
-    draw_filled_rectangle(pen, window_x, window_y, window_size, window_size, cabin_window_details['border_color'], initial_light_color)
-    
-    # Window panes
-    pen.pencolor(cabin_window_details['pane_color'])
-    pen.goto(window_x + window_size / 2, window_y)
-    pen.pendown()
-    pen.goto(window_x + window_size / 2, window_y + window_size)
-    pen.penup()
-    pen.goto(window_x, window_y + window_size / 2)
-    pen.pendown()
-    pen.goto(window_x + window_size, window_y + window_size / 2)
-    pen.penup()
     chimney_width = 20
     chimney_height = 35
     chimney_x_local = cabin_width * 0.75 # Relative to cabin base_x
     # Simplified chimney y placement
     chimney_on_roof_y_offset = cabin_height + roof_height * 0.6 
-    draw_filled_rectangle(pen, base_x + chimney_x_local, base_y + chimney_on_roof_y_offset - chimney_height*0.3, chimney_width, chimney_height, "black", chimney_color)
-    return cabin_width, base_x + chimney_x_local + chimney_width / 2, base_y + chimney_on_roof_y_offset + chimney_height*0.7
-
-# --- Smoke Particle System ---
-def create_smoke_particle(start_x, start_y):
-    particle = {
-        'x': start_x + random.uniform(-2, 2),
-        'y': start_y + random.uniform(-2, 2),
-        'dx': random.uniform(-0.3, 0.3), # Horizontal drift
-        'dy': random.uniform(0.5, 1.2),  # Vertical speed
-        'radius': random.uniform(3, 6),
-        'max_life': random.randint(80, 150), # Frames to live
-        'life': 0, # Current age
-        'initial_alpha': 0.7 # For color
-    }
-    particle['life'] = particle['max_life'] # Start with full life
-    smoke_particles.append(particle)
-
-def update_and_draw_all_smoke():
-    global smoke_particles
-    smoke_pen.clear() # Clear previous frame's smoke
-    
-    new_particles = []
-    for p in smoke_particles:
-        p['x'] += p['dx']
-        p['y'] += p['dy']
-        p['life'] -= 1
-        
-        if p['life'] > 0:
-            new_particles.append(p)
-            # Calculate alpha (0.0 to 1.0)
-            alpha = (p['life'] / p['max_life']) * p['initial_alpha']
-            alpha = max(0, min(1, alpha)) # Clamp between 0 and 1
-            
-            # Convert alpha to a grayscale color (e.g., (r,g,b) where r=g=b)
-            # Turtle colors are usually strings or (r,g,b) tuples from 0-1 or 0-255
-            # For simplicity, let's use a dot with varying size and a fixed light gray
-            # A more advanced way is to change color from gray to background color
-            
-            # Simple: size decreases, color fixed
-            current_radius = p['radius'] * (p['life'] / p['max_life'])
-            if current_radius > 0.5: # Only draw if reasonably visible
-                smoke_pen.penup()
-                smoke_pen.goto(p['x'], p['y'])
-                # smoke_pen.dot(current_radius * 2, "#E0E0E0") # Light gray dot
-                
-                # Draw puff using circles (like original static smoke)
-                smoke_pen.pencolor(f"#{int(200 + alpha*50):02x}{int(200 + alpha*50):02x}{int(200 + alpha*50):02x}") # Fading gray
-                smoke_pen.pendown()
-                original_heading = smoke_pen.heading()
-                smoke_pen.setheading(random.randint(0,360))
-                for _ in range(3):
-                     smoke_pen.circle(current_radius, 100 + alpha * 20)
-                     smoke_pen.left(50 + alpha * 10)
-                smoke_pen.setheading(original_heading)
-                smoke_pen.penup()
-
-    smoke_particles = new_particles
-
+    draw_filled_rectangle(t, base_x + chimney_x_local, base_y + chimney_on_roof_y_offset - chimney_height*0.3, chimney_width, chimney_height, "black", chimney_color)
+    return (cabin_width, base_x + chimney_x_local + chimney_width / 2, base_y + chimney_on_roof_y_offset + chimney_height*0.7,
+            (window_x, window_y, window_size))
 
 # --- Draw Tree ---
-def draw_tree(base_x, base_y):
+def draw_tree(t, base_x, base_y, rng=random, steps=None):
     trunk_color = "#8B4513"
     crown_color = "#228B22"
     trunk_width = 20
     trunk_height = 50
-    pen.setheading(0)
-    draw_filled_rectangle(pen, base_x - trunk_width / 2, base_y, trunk_width, trunk_height, "black", trunk_color)
+    t.setheading(0)
+    draw_filled_rectangle(t, base_x - trunk_width / 2, base_y, trunk_width, trunk_height, "black", trunk_color)
     crown_center_x = base_x
     crown_center_y = base_y + trunk_height + 20
-    original_pencolor = pen.pencolor()
-    original_fillcolor = pen.fillcolor()
-    pen.pencolor(crown_color)
-    pen.fillcolor(crown_color)
+    original_pencolor = t.pencolor()
+    original_fillcolor = t.fillcolor()
+    t.pencolor(crown_color)
+    t.fillcolor(crown_color)
     for _ in range(5):
-        offset_x = random.randint(-15, 15)
-        offset_y = random.randint(-10, 10)
-        radius = random.randint(20, 35)
-        pen.penup()
-        pen.goto(crown_center_x + offset_x, crown_center_y + offset_y - radius)
-        pen.pendown()
-        pen.begin_fill()
-        pen.circle(radius)
-        pen.end_fill()
-        pen.penup()
-    pen.pencolor(original_pencolor)
-    pen.fillcolor(original_fillcolor)
+        offset_x = rng.randint(-15, 15)
+        offset_y = rng.randint(-10, 10)
+        radius = rng.randint(20, 35)
+        t.penup()
+        t.goto(crown_center_x + offset_x, crown_center_y + offset_y - radius)
+        t.pendown()
+        t.begin_fill()
+        t.circle(radius, steps=steps)
+        t.end_fill()
+        t.penup()
+    t.pencolor(original_pencolor)
+    t.fillcolor(original_fillcolor)
+
+
+# A tree whose crowns come from a fixed seed, so each variant can be recorded once
+def draw_tree_variant(t, base_x, base_y, variant, steps=None):
+    draw_tree(t, base_x, base_y, random.Random(variant), steps=steps)
 
 
 # --- Draw Fence ---
-def draw_fence(start_x, start_y, num_sections, section_width, post_height):
-    original_pencolor = pen.pencolor()
-    original_pensize = pen.pensize()
-    pen.pencolor("#8B4513")
-    pen.pensize(3)
+def draw_fence(t, start_x, start_y, num_sections, section_width, post_height):
+    original_pencolor = t.pencolor()
+    original_pensize = t.pensize()
+    t.pencolor("#8B4513")
+    t.pensize(3)
     for i in range(num_sections + 1):
         x = start_x + i * section_width
-        pen.penup()
-        pen.goto(x, start_y)
-        pen.pendown()
-        pen.goto(x, start_y + post_height)
+        t.penup()
+        t.goto(x, start_y)
+        t.pendown()
+        t.goto(x, start_y + post_height)
     for j in range(2):
         rail_y = start_y + post_height * (0.3 + j * 0.4)
-        pen.penup()
-        pen.goto(start_x, rail_y)
-        pen.pendown()
-        pen.goto(start_x + num_sections * section_width, rail_y)
-    pen.pensize(original_pensize)
-    pen.pencolor(original_pencolor)
-    pen.penup()
+        t.penup()
+        t.goto(start_x, rail_y)
+        t.pendown()
+        t.goto(start_x + num_sections * section_width, rail_y)
+    t.pensize(original_pensize)
+    t.pencolor(original_pencolor)
+    t.penup()
 
 # --- Draw Holding Hands Couple Silhouette ---
 def draw_holding_hands_couple_silhouette(t, base_x, base_y, scale=1.0, color="black"):
@@ -384,182 +387,654 @@ def draw_holding_hands_couple_silhouette(t, base_x, base_y, scale=1.0, color="bl
     t.penup()
     t.pensize(1) # Reset pensize
 # --- Draw Ground ---
-def draw_ground_plane():
+def draw_ground_plane(t):
     ground_color = "#90EE90"
-    draw_filled_rectangle(pen, -SCREEN_WIDTH / 2, -SCREEN_HEIGHT / 2, SCREEN_WIDTH, SCREEN_HEIGHT / 4, ground_color, ground_color)
-
-# --- Animation Loop ---
-def animate_scene():
-    global smoke_frame_count, SMOKE_START_X, SMOKE_START_Y
-    global window_frame_count, cabin_window_details
-    global sun_ray_frame_count, sun_details, sun_effects_pen
-    global couple_current_x, couple_current_y, couple_dx, couple_min_x, couple_max_x, couple_pen, COUPLE_SCALE, ground_level_y
-    global text_pen, CAPTION_TEXTS, current_caption_list_index, displayed_text, current_char_index, TEXT_ANIMATION_INTERVAL, text_animation_frame_count, TEXT_Y_POSITION, TEXT_FONT, TEXT_HOLD_INTERVAL, text_hold_frame_count
-    
-    # Animate Smoke
-    smoke_frame_count +=1
-    if smoke_frame_count % SMOKE_CREATION_INTERVAL == 0:
-        create_smoke_particle(SMOKE_START_X, SMOKE_START_Y)
-        if len(smoke_particles) > 60 : # Limit max particles slightly more
-             smoke_particles.pop(0)
-    update_and_draw_all_smoke()
-
-    # Animate Window Light
-    window_frame_count += 1
-    if window_frame_count % WINDOW_FLICKER_INTERVAL == 0:
-        cabin_window_details['current_color_index'] = 1 - cabin_window_details['current_color_index'] # Toggle 0 and 1
-        new_light_color = cabin_window_details['colors'][cabin_window_details['current_color_index']]
-        
-        w_x = cabin_window_details['x']
-        w_y = cabin_window_details['y']
-        w_size = cabin_window_details['size']
-        
-        # Redraw window light fill
-        # Important: Use the main 'pen' for this as it's part of the static scene structure
-        original_pen_pencolor = pen.pencolor()
-        original_pen_fillcolor = pen.fillcolor()
-        
-        pen.pencolor(new_light_color) # Match border to fill to avoid issues when filling over
-        pen.fillcolor(new_light_color)
-        pen.penup()
-        pen.goto(w_x, w_y)
-        pen.pendown()
-        pen.begin_fill()
-        for _ in range(2): # Draw rectangle path
-            pen.forward(w_size)
-            pen.left(90)
-            pen.forward(w_size)
-            pen.left(90)
-        pen.end_fill()
-        pen.penup()
-        
-        # Redraw window panes over the new fill
-        pen.pencolor(cabin_window_details['pane_color'])
-        pen.penup()
-        pen.goto(w_x + w_size / 2, w_y)
-        pen.pendown()
-        pen.goto(w_x + w_size / 2, w_y + w_size) # Vertical pane
-        pen.penup()
-        pen.goto(w_x, w_y + w_size / 2)
-        pen.pendown()
-        pen.goto(w_x + w_size, w_y + w_size / 2) # Horizontal pane
-        pen.penup()
-
-        pen.pencolor(original_pen_pencolor) # Restore pen's original colors
-        pen.fillcolor(original_pen_fillcolor)
-
-    # Animate Sun Rays
-    sun_effects_pen.clear() # Clear previous rays
-    sun_ray_frame_count += 1
-    if sun_ray_frame_count % SUN_RAY_FLICKER_INTERVAL == 0:
-        if sun_details['current_ray_length'] == sun_details['ray_length_long']:
-            sun_details['current_ray_length'] = sun_details['ray_length_short']
+    draw_filled_rectangle(t, -SCREEN_WIDTH / 2, -SCREEN_HEIGHT / 2, SCREEN_WIDTH, SCREEN_HEIGHT / 4, ground_color, ground_color)
+
+
+# --- Scene File Elements ---
+# The helper drawing each element type of a scene file (see scenefile.py)
+SCENE_HELPERS = {
+    "sun": draw_sun,
+    "ground": draw_ground_plane,
+    "cabin": draw_cabin,
+    "tree": draw_tree_variant,
+    "fence": draw_fence,
+}
+
+
+# --- Scene ---
+# Owns the screen, its pens and all animation state. Creating a Scene is
+# cheap and touches no window: the screen and pens are made on first use, so
+# tooling can import this module, build a scene offscreen and drive it frame
+# by frame.
+#
+#   scene = Scene(parse_options(["--headless", "--frames", "0"]))
+#   scene.build()   # static layer
+#   scene.step()    # one simulation step + one presented frame
+#   scene.run()     # build if needed, then the scheduled loop
+class Scene:
+    def __init__(self, options=None):
+        self.options = options or parse_options([])
+        self.created_at = time.perf_counter()
+        self.time_to_first_frame = None # Seconds from construction to the first presented frame
+        self.built = False
+        self._screen = None
+        self._pen = None
+        self.smoke_layer = None # Pooled puff items from cached outlines
+        # Sun rays and the moving couple are retained sprites (see sprites.py),
+        # created on the first animation frame
+        self.sun_ray_sprite = None
+        self.couple_sprite = None
+        self.caption = None # Typewriter caption: one retained text item
+        self.background_image = None
+        self.performance_hud = None # Created after the static scene so it draws on top
+        self.frame_scheduler = None
+
+        # Everything that moves; drawing only reads it
+        seed = self.options.seed
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        self.caption_texts = list(CAPTION_TEXTS)
+        # Live captions (see captionfeed.py) go into slots after the rotating ones
+        self.live_captions = bool(self.options.caption_socket or self.options.caption_fifo)
+        self.live_slots = ()
+        if self.live_captions:
+            self.live_slots = tuple(range(len(CAPTION_TEXTS), len(CAPTION_TEXTS) + LIVE_CAPTION_SLOTS))
+            self.caption_texts += [""] * LIVE_CAPTION_SLOTS
+        self.caption_feed = None # Created on the event loop by run()
+        self._live_queued = None # (slot, arrival) of the live caption handed to the typewriter
+        # A village shares one smoke store among the chimneys near the view
+        self.smoke_cap_scale = 4 if self.options.village else 1
+        self.state = simulation.SceneState(seed, [len(text) for text in self.caption_texts],
+                                           smoke_capacity=self.options.max_smoke * self.smoke_cap_scale,
+                                           caption_count=len(CAPTION_TEXTS))
+        self.village = None # Instanced props (see village.py) when --village is given
+        # With --simulation thread/process the worker owns the state and
+        # self.state is the newest snapshot it published (see simworker.py)
+        self.simulation_worker = None
+        self.snapshots = 0 # Snapshots drawn
+        self.steps_missed = 0 # Simulated steps never drawn: the worker ran ahead
+
+        # Layout, filled in by build_static_scene
+        self.smoke_start_x = 0 # Top of the chimney
+        self.smoke_start_y = 0
+        self.cabin_window_details = {
+            'x': 0, 'y': 0, 'size': 0,
+            'colors': list(WINDOW_LIGHT_COLORS),
+            'border_color': "black",
+            'pane_color': "saddlebrown",
+            'fill_item': None,   # Canvas items of the retained window, set by build_static_scene
+            'pane_items': []
+        }
+
+        self.sun_details = {
+            'x': 0, 'y': 0, 'radius': 0, 'color': "gold", # Will be populated
+            'ray_color': "#FFFFA0", # Light yellow for rays
+            'num_rays': 12,
+            'ray_length_short': 7,
+            'ray_length_long': 12
+        }
+        self.ground_level_y = -SCREEN_HEIGHT / 2 + SCREEN_HEIGHT / 4
+        self.couple_home_x = 0 # Middle of the couple's walk
+        self.scene_from_cache = None # With --scene: whether the compiled scene came from the cache
+
+        self.profiler = FrameProfiler(enabled=self.options.hud or bool(self.options.profile_csv),
+                                      csv_path=self.options.profile_csv)
+
+        # Adaptive detail: the controller picks a level, apply_quality() maps
+        # it onto the scene
+        self.quality = None
+        adaptive = self.options.adaptive
+        if adaptive == "on" or (adaptive == "auto" and not self.options.headless):
+            self.quality = QualityController(budget_ms=self.options.frame_budget or 1000 / self.options.fps)
+        self.puff_arcs = 3
+        self.circle_steps = None # Turtle's own circle resolution
+        self._frame_start = None # perf_counter at the first step of the frame being made
+        self._drawn = {} # layer -> what it showed when last drawn; unchanged layers are skipped
+        self.skipped_updates = 0 # Frames where nothing changed: a window skips the screen update
+        if self.quality is not None:
+            self.apply_quality(self.quality.settings)
+
+    # --- Lazy Screen and Pens ---
+    @property
+    def screen(self):
+        if self._screen is None:
+            options = self.options
+            if options.headless:
+                screen = headless.HeadlessScreen(SCREEN_WIDTH, SCREEN_HEIGHT, frames=options.frames,
+                                                 output_dir=options.out, save_every=options.save_every,
+                                                 image_format=options.format,
+                                                 realtime=options.simulation != "inline" or self.live_captions)
+            else:
+                screen = turtle.Screen()
+            screen.setup(width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
+            screen.bgcolor(SKY_COLOR)
+            screen.title(WINDOW_TITLE)
+            screen.tracer(0)
+            self._screen = screen
+        return self._screen
+
+    @property
+    def pen(self):
+        if self._pen is None:
+            self._pen = canvaspen.make_pen(self.screen, self.options.backend) # For static elements
+        return self._pen
+
+    # --- Retained Window Light ---
+    def create_window_light(self):
+        details = self.cabin_window_details
+        w_x = details['x']
+        w_y = details['y']
+        w_size = details['size']
+        initial_light_color = details['colors'][self.state.window_color_index]
+        screen = self.screen
+        for item in [details['fill_item']] + details['pane_items']:
+            if item is not None: # Left over from a previous build
+                screen._delete(item)
+
+        # Light fill with border, then the two panes on top of it
+        fill_item = screen._createpoly()
+        screen._drawpoly(fill_item, ((w_x, w_y), (w_x + w_size, w_y), (w_x + w_size, w_y + w_size), (w_x, w_y + w_size)),
+                         fill=initial_light_color, outline=details['border_color'], width=1)
+        pane_items = []
+        for pane in (((w_x + w_size / 2, w_y), (w_x + w_size / 2, w_y + w_size)),  # Vertical pane
+                     ((w_x, w_y + w_size / 2), (w_x + w_size, w_y + w_size / 2))): # Horizontal pane
+            pane_item = screen._createline()
+            screen._drawline(pane_item, pane, fill=details['pane_color'], width=1)
+            pane_items.append(pane_item)
+        details['fill_item'] = fill_item
+        details['pane_items'] = pane_items
+
+    def set_window_light_color(self, color):
+        # Recolor the existing fill item in place; the canvas does not grow
+        self.screen.getcanvas().itemconfigure(self.cabin_window_details['fill_item'], fill=color)
+
+    # --- Smoke Particle System ---
+    def update_and_draw_all_smoke(self):
+        self.state.smoke.update() # Batched position, life and alpha update
+        self.draw_all_smoke()
+
+    def draw_all_smoke(self):
+        # Each visible puff is one pooled line item: its cached outline translated
+        # to the particle, in the fading gray for its alpha
+        if self.smoke_layer is None:
+            self.smoke_layer = SmokeLayer(self.screen)
+            self.smoke_layer.cache.arcs = self.puff_arcs
+        state = self.state
+        if state.emitters is not None: # Village smoke is in world coordinates
+            origin = (-simulation.camera_x(state), 0)
         else:
-            sun_details['current_ray_length'] = sun_details['ray_length_long']
-
-    if sun_details['radius'] > 0: # Only draw if sun is initialized
-        num_rays = sun_details['num_rays']
-        actual_ray_length = sun_details['current_ray_length']
-        sun_center_x = sun_details['x']
-        sun_center_y = sun_details['y']
-        
-        sun_effects_pen.pencolor(sun_details['ray_color'])
-        sun_effects_pen.pensize(2)
-        for i in range(num_rays):
-            angle = (360 / num_rays) * i + (sun_ray_frame_count % (360 // num_rays)) # Slight rotation effect
-            sun_effects_pen.penup()
-            sun_effects_pen.goto(sun_center_x, sun_center_y)
-            sun_effects_pen.setheading(angle)
-            sun_effects_pen.forward(sun_details['radius'] * 0.8) # Start rays slightly inside the sun for better look
-            sun_effects_pen.pendown()
-            sun_effects_pen.forward(actual_ray_length)
-        sun_effects_pen.penup()
-
-    # Animate Couple
-    if couple_min_x != couple_max_x: # Only animate if range is set
-        couple_pen.clear()
-        couple_current_x += couple_dx
-        if couple_current_x >= couple_max_x or couple_current_x <= couple_min_x:
-            couple_dx *= -1 # Reverse direction
-        
-        # Ensure couple_current_y is set (it should be from main logic init)
-        # It's better to pass ground_level_y or ensure it's globally accessible and set before animation starts
-        draw_holding_hands_couple_silhouette(couple_pen, couple_current_x, couple_current_y, scale=COUPLE_SCALE)
-
-    # Animate Text
-    current_full_text_to_display = CAPTION_TEXTS[current_caption_list_index]
-
-    if current_char_index < len(current_full_text_to_display):
-        # Typing out the text
-        text_animation_frame_count += 1
-        if text_animation_frame_count % TEXT_ANIMATION_INTERVAL == 0:
-            displayed_text += current_full_text_to_display[current_char_index]
-            current_char_index += 1
-            text_pen.clear()
-            text_pen.goto(0, TEXT_Y_POSITION)
-            text_pen.write(displayed_text, align="center", font=TEXT_FONT)
-    elif displayed_text == current_full_text_to_display: # Text is fully displayed, start holding
-        text_hold_frame_count += 1
-        if text_hold_frame_count >= TEXT_HOLD_INTERVAL:
-            # Reset for next loop and switch to next caption
-            current_caption_list_index = (current_caption_list_index + 1) % len(CAPTION_TEXTS)
-            displayed_text = ""
-            current_char_index = 0
-            text_animation_frame_count = 0
-            text_hold_frame_count = 0
-            text_pen.clear()
-    # If displayed_text is empty and current_char_index is 0, it will start typing the new current_full_text_to_display.
-
-    screen.update()
-    screen.ontimer(animate_scene, 50) # Approx 20 FPS
-
-# --- Main Drawing Logic ---
-sun_radius = 40
-sun_padding = 30
-sun_x_pos = -SCREEN_WIDTH / 2 + sun_radius + sun_padding
-sun_y_pos = SCREEN_HEIGHT / 2 - sun_radius - sun_padding
-draw_sun(pen, sun_x_pos, sun_y_pos, sun_radius, "gold")
-# Populate sun_details (note: sun_y_pos is the top-left reference for draw_sun, actual center is y_pos)
-sun_details['x'] = sun_x_pos
-sun_details['y'] = sun_y_pos
-sun_details['radius'] = sun_radius
-sun_details['color'] = "gold"
-
-
-ground_level_y = -SCREEN_HEIGHT / 2 + SCREEN_HEIGHT / 4
-draw_ground_plane()
-
-cabin_base_x = -75
-cabin_base_y = ground_level_y
-cabin_width_drawn, SMOKE_START_X, SMOKE_START_Y = draw_cabin(cabin_base_x, cabin_base_y)
-# Static smoke call removed
-
-draw_tree(cabin_base_x - 80, ground_level_y)
-draw_tree(cabin_base_x + cabin_width_drawn + 60, ground_level_y)
-
-draw_fence(cabin_base_x - 120, ground_level_y, 5, 30, 40)
-draw_fence(cabin_base_x + cabin_width_drawn + 20, ground_level_y, 4, 30, 40)
-
-last_fence_start_x = cabin_base_x + cabin_width_drawn + 30
-last_fence_sections = 3
-last_fence_section_width = 30
-draw_fence(last_fence_start_x, ground_level_y, last_fence_sections, last_fence_section_width, 40)
-
-# Initialize Couple Animation Parameters
-# couple_current_y is already global, ensure it's set if not passed to animate_scene
-# We use the global ground_level_y which is set before this.
-couple_current_y = ground_level_y
-initial_couple_base_x = last_fence_start_x + (last_fence_sections * last_fence_section_width) + 70
-couple_current_x = initial_couple_base_x
-couple_min_x = initial_couple_base_x - COUPLE_MOVEMENT_RANGE / 2
-couple_max_x = initial_couple_base_x + COUPLE_MOVEMENT_RANGE / 2
-# couple_dx and COUPLE_SCALE are already defined globally
-
-# Static drawing of couple removed, will be handled by animate_scene
-
-# Static caption text drawing removed, handled by animate_scene
-
-screen.update() # Initial draw of static elements
-animate_scene() # Start animation
-
-screen.mainloop()
\ No newline at end of file
+            origin = (self.smoke_start_x, self.smoke_start_y)
+        self.smoke_layer.draw(state.smoke, state.frame, state.seed, origin)
+
+    # --- Static Scene ---
+    def build_static_scene(self):
+        pen = self.pen
+        pen.clear() # Rebuilding starts from an empty static layer
+        if self.options.scene:
+            self.build_scene_file(self.options.scene)
+            return
+        sun_radius = 40
+        sun_padding = 30
+        sun_x_pos = -SCREEN_WIDTH / 2 + sun_radius + sun_padding
+        sun_y_pos = SCREEN_HEIGHT / 2 - sun_radius - sun_padding
+        draw_sun(pen, sun_x_pos, sun_y_pos, sun_radius, "gold", steps=self.circle_steps)
+        # Populate sun_details (note: sun_y_pos is the top-left reference for draw_sun, actual center is y_pos)
+        self.sun_details['x'] = sun_x_pos
+        self.sun_details['y'] = sun_y_pos
+        self.sun_details['radius'] = sun_radius
+        self.sun_details['color'] = "gold"
+
+        ground_level_y = self.ground_level_y
+        draw_ground_plane(pen)
+
+        # The couple walks around a spot just past the last fence
+        self.couple_home_x = SCREEN_WIDTH / 2 - 135
+        if self.options.village:
+            if self.village is None:
+                self.build_village(self.options.village)
+            else:
+                self.village.set_prototypes(self.village_prototypes())
+            return
+
+        cabin_base_x = -75
+        cabin_base_y = ground_level_y
+        cabin_width_drawn, self.smoke_start_x, self.smoke_start_y, window = draw_cabin(pen, cabin_base_x, cabin_base_y)
+        # The window is a retained layer: its items are created once and only
+        # recolored when the light flickers (see set_window_light_color)
+        self.cabin_window_details['x'], self.cabin_window_details['y'], self.cabin_window_details['size'] = window
+        self.create_window_light()
+
+        tree_rng = random.Random(self.state.seed) # Same seed, same crowns
+        draw_tree(pen, cabin_base_x - 80, ground_level_y, tree_rng, steps=self.circle_steps)
+        draw_tree(pen, cabin_base_x + cabin_width_drawn + 60, ground_level_y, tree_rng, steps=self.circle_steps)
+
+        draw_fence(pen, cabin_base_x - 120, ground_level_y, 5, 30, 40)
+        draw_fence(pen, cabin_base_x + cabin_width_drawn + 20, ground_level_y, 4, 30, 40)
+
+        last_fence_start_x = cabin_base_x + cabin_width_drawn + 30
+        last_fence_sections = 3
+        last_fence_section_width = 30
+        draw_fence(pen, last_fence_start_x, ground_level_y, last_fence_sections, last_fence_section_width, 40)
+
+
+    def build_scene_file(self, path):
+        # The static layer from a compiled scene file, drawn as one display list
+        compiled, self.scene_from_cache = scenefile.load_scene(path, SCENE_HELPERS, self.circle_steps,
+                                                               self.options.scene_cache, self.options.backend)
+        if compiled['sky']:
+            self.screen.bgcolor(compiled['sky'])
+        scenefile.draw_display_list(self.screen, self.pen, compiled['items'])
+        layout = compiled['layout']
+        if "sun" in layout:
+            sun_x, sun_y, sun_radius, sun_color = layout['sun']
+            self.sun_details.update(x=sun_x, y=sun_y, radius=sun_radius, color=sun_color)
+        if "chimney" in layout:
+            self.smoke_start_x, self.smoke_start_y = layout['chimney']
+            details = self.cabin_window_details
+            details['x'], details['y'], details['size'] = layout['window']
+            self.create_window_light()
+        if "couple" in layout:
+            self.couple_home_x, self.ground_level_y = layout['couple']
+
+    # --- Village ---
+    def village_prototypes(self):
+        steps = self.circle_steps
+        backend = self.options.backend
+        cabin = village.Prototype.from_drawing(draw_cabin, backend=backend)
+        cabin_width, smoke_x, smoke_y, window = cabin.result
+        cabin.chimney = (smoke_x, smoke_y)
+        cabin.window = window
+        prototypes = {"cabin": cabin}
+        for variant in range(VILLAGE_TREE_VARIANTS):
+            prototypes["tree%d" % variant] = village.Prototype.from_drawing(draw_tree_variant, variant, steps=steps,
+                                                                            backend=backend)
+        for sections in (3, 4, 5):
+            prototypes["fence%d" % sections] = village.Prototype.from_drawing(draw_fence, sections, 30, 40, backend=backend)
+        return prototypes
+
+    def build_village(self, cabins):
+        # Lay out `cabins` slots like the single-cabin scene, each cabin with
+        # its own tint, tree variants, window flicker phase and smoke phase
+        seed = self.state.seed
+        ground_level_y = self.ground_level_y
+        self.village = village.Village(self.screen, self.village_prototypes(), SCREEN_WIDTH,
+                                       self.cabin_window_details['colors'],
+                                       self.cabin_window_details['border_color'], self.cabin_window_details['pane_color'])
+        for k in range(cabins):
+            base_x = -75 + k * VILLAGE_SLOT_WIDTH
+            h = counter_hash(seed, 4, k)
+            wall_tint = VILLAGE_WALL_TINTS[h % len(VILLAGE_WALL_TINTS)]
+            crown_tint = VILLAGE_CROWN_TINTS[(h >> 8) % len(VILLAGE_CROWN_TINTS)]
+            self.village.add("cabin", base_x, ground_level_y, wall_tint, (h >> 16) % 4 * 0.1, phase=(h >> 24) % 60)
+            self.village.add("tree%d" % ((h >> 32) % VILLAGE_TREE_VARIANTS), base_x - 80, ground_level_y,
+                             crown_tint, (h >> 36) % 3 * 0.15)
+            self.village.add("tree%d" % ((h >> 40) % VILLAGE_TREE_VARIANTS), base_x + 210, ground_level_y,
+                             crown_tint, (h >> 44) % 3 * 0.15)
+            self.village.add("fence5", base_x - 120, ground_level_y)
+            self.village.add("fence4", base_x + 170, ground_level_y)
+            self.village.add("fence3", base_x + 180, ground_level_y)
+        chimneys, extent = self.village.finish()
+        self.state.emitters = simulation.Emitters(chimneys)
+        self.state.world = extent
+        self.state.view_width = SCREEN_WIDTH
+        self.village.place_marker()
+
+    def build(self):
+        # Static layer, optionally flattened into one pre-rendered background image
+        self.build_static_scene()
+        self.bake_background()
+        if self.options.hud and self.performance_hud is None:
+            self.performance_hud = PerformanceHUD(self.screen, self.profiler, SCREEN_WIDTH / 2 - 10, SCREEN_HEIGHT / 2 - 150)
+            self.performance_hud.status_lines = self.status_lines()
+        self.screen.update() # Initial draw of static elements
+        self.built = True
+
+    def bake_background(self):
+        if self.options.cache_background:
+            self.background_image = background.bake_static_layer(self.screen, self.pen, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def rebuild_static_layer(self):
+        # Redraw the static layer (e.g. at another circle resolution) beneath
+        # the animated items, which stay where they are
+        self.build_static_scene()
+        cv = self.screen.getcanvas()
+        for item in reversed(self.pen.items):
+            cv.tag_lower(item)
+        cv.tag_lower(self.screen._bgpic) # The background picture stays lowest
+        self.bake_background()
+
+    # --- Adaptive Quality ---
+    def apply_quality(self, settings):
+        smoke_limit = max(1, round(settings['smoke_share'] * self.options.max_smoke)) * self.smoke_cap_scale
+        self.change_state(simulation.set_detail, settings['smoke_interval'], smoke_limit)
+        self.puff_arcs = settings['puff_arcs']
+        if self.smoke_layer is not None:
+            self.smoke_layer.cache.arcs = self.puff_arcs
+        if settings['num_rays'] != self.sun_details['num_rays']:
+            self.sun_details['num_rays'] = settings['num_rays']
+            if self.sun_ray_sprite is not None: # Recreated with the new count on the next draw
+                self.sun_ray_sprite.delete()
+                self.sun_ray_sprite = None
+        if settings['circle_steps'] != self.circle_steps:
+            self.circle_steps = settings['circle_steps']
+            if self.built:
+                self.rebuild_static_layer()
+        if self.performance_hud is not None:
+            self.performance_hud.status_lines = self.status_lines()
+
+    def status_lines(self):
+        # Extra HUD lines: unchanged frames, the detail level and the live caption feed
+        lines = ["unchanged frames %d" % self.skipped_updates]
+        if self.quality is not None:
+            lines.append(self.quality.status())
+        if self.caption_feed is not None:
+            lines.append(self.caption_feed.status())
+        return lines
+
+    # --- Live Captions ---
+    def take_live_caption(self):
+        # Hand the next queued live caption to the typewriter, in the live
+        # slot not on screen; it shows once the current caption is done
+        if self.caption_feed is None or self._live_queued is not None:
+            return
+        queued = self.caption_feed.get_nowait()
+        if queued is None:
+            return
+        text, arrival = queued
+        slot = self.live_slots[0] if self.state.caption_index != self.live_slots[0] else self.live_slots[1]
+        self.caption.set_text(slot, text)
+        self.change_state(simulation.queue_caption, slot, len(text))
+        self._live_queued = (slot, arrival)
+
+    def check_live_caption_shown(self):
+        # Called after the screen update: the queued caption's first glyph is up
+        slot, arrival = self._live_queued
+        if self.state.caption_index == slot and self.state.char_index >= 1:
+            self.caption_feed.record_shown(arrival)
+            self._live_queued = None
+            if self.performance_hud is not None:
+                self.performance_hud.status_lines = self.status_lines()
+
+    # --- Animation ---
+    # One fixed simulation step (see simulation.step), timed per subsystem
+    def advance(self):
+        state = self.state
+        profiler = self.profiler
+        if self._frame_start is None:
+            self._frame_start = time.perf_counter()
+        profiler.lap_start()
+        state.frame += 1
+        simulation.step_smoke(state)
+        profiler.lap("smoke")
+        simulation.step_window(state)
+        profiler.lap("window")
+        simulation.step_sun(state)
+        profiler.lap("sun")
+        simulation.step_couple(state)
+        profiler.lap("couple")
+        simulation.step_caption(state)
+        profiler.lap("caption")
+
+    def fast_forward(self, steps):
+        # Jump the animation ahead without drawing the frames in between
+        self.change_state(simulation.fast_forward, steps)
+        if self._live_queued is not None: # Long jumps drop queued captions: queue it again
+            slot = self._live_queued[0]
+            self.change_state(simulation.queue_caption, slot, len(self.caption_texts[slot]))
+
+    # --- Simulation Worker ---
+    def change_state(self, func, *args):
+        # Apply func(state, *args) wherever the state lives: on the worker
+        # when there is one (between its steps), else right here
+        if self.simulation_worker is not None:
+            self.simulation_worker.submit(func, *args)
+        else:
+            func(self.state, *args)
+
+    def start_simulation_worker(self):
+        # From here on the worker steps the state; frames draw its snapshots
+        self.simulation_worker = simworker.WORKERS[self.options.simulation](self.state, SIMULATION_HZ)
+        self.simulation_worker.start()
+
+    def receive_snapshot(self):
+        state = self.simulation_worker.latest()
+        if state.frame != self.state.frame:
+            self.steps_missed += max(0, state.frame - self.state.frame - 1)
+            self.snapshots += 1
+        self.state = state
+
+    def present(self):
+        # One frame of the newest snapshot (the worker's stand-in for advance + draw)
+        self._frame_start = time.perf_counter()
+        self.receive_snapshot()
+        self.draw()
+
+    def stop_simulation_worker(self):
+        if self.simulation_worker is not None:
+            self.simulation_worker.stop()
+            self.simulation_worker = None
+
+    # Draws the current state; runs once per presented frame. Each layer
+    # remembers what it last showed and is only touched when that changes;
+    # when no layer changed the screen is not refreshed either.
+    def draw(self):
+        state = self.state
+        profiler = self.profiler
+        screen = self.screen
+        drawn = self._drawn
+        dirty = False
+        profiler.lap_start()
+        # Puffs only move when the state steps: a reused worker snapshot leaves them be
+        if (state.smoke.live or self.smoke_layer is None or self.smoke_layer.visible) and drawn.get("smoke") != state.frame:
+            self.draw_all_smoke()
+            drawn["smoke"] = state.frame
+            dirty = True
+        profiler.lap("smoke")
+
+        details = self.cabin_window_details
+        if details['fill_item'] is not None and drawn.get("window") != state.window_color_index:
+            self.set_window_light_color(details['colors'][state.window_color_index])
+            drawn["window"] = state.window_color_index
+            dirty = True
+        profiler.lap("window")
+
+        if self.village is not None:
+            camera = simulation.camera_x(state)
+            if camera != self.village.camera or drawn.get("village") != state.frame:
+                self.village.draw(camera, state.frame)
+                drawn["village"] = state.frame
+                dirty = True
+            profiler.lap("village")
+
+        sun_details = self.sun_details
+        if sun_details['radius'] > 0: # Only draw if sun is initialized
+            num_rays = sun_details['num_rays']
+            if self.sun_ray_sprite is None:
+                # Start rays slightly inside the sun for better look
+                self.sun_ray_sprite = sprites.RaySprite(screen, sun_details['x'], sun_details['y'], sun_details['radius'] * 0.8,
+                                                        num_rays, sun_details['ray_color'], width=2)
+            # Slight rotation effect: the ray set turns by one degree per frame
+            ray_length = sun_details['ray_length_long'] if state.long_rays else sun_details['ray_length_short']
+            pose = (state.frame % (360 // num_rays), ray_length)
+            if pose != self.sun_ray_sprite.pose:
+                self.sun_ray_sprite.show(*pose)
+                dirty = True
+        profiler.lap("sun")
+
+        if self.built:
+            # The silhouette is built once for COUPLE_SCALE and then only moved
+            if self.couple_sprite is None:
+                self.couple_sprite = sprites.Sprite.from_drawing(screen, draw_holding_hands_couple_silhouette,
+                                                                 scale=COUPLE_SCALE, backend=self.options.backend)
+                dirty = True
+            couple_x = self.couple_home_x + state.couple_offset
+            if couple_x != self.couple_sprite.x or self.ground_level_y != self.couple_sprite.y:
+                self.couple_sprite.move_to(couple_x, self.ground_level_y)
+                dirty = True
+        profiler.lap("couple")
+
+        # Captions are measured once; each new character only updates the text item
+        if self.caption is None:
+            self.caption = Caption(screen, self.caption_texts, 0, TEXT_Y_POSITION, TEXT_FONT, TEXT_COLOR)
+        self.take_live_caption()
+        shown = (state.caption_index, state.char_index)
+        if drawn.get("caption") != shown:
+            self.caption.show(*shown)
+            drawn["caption"] = shown
+            dirty = True
+        profiler.lap("caption")
+
+        if self.performance_hud is not None:
+            if self.profiler.frame % self.performance_hud.refresh_frames == 0:
+                self.performance_hud.status_lines = self.status_lines()
+                self.performance_hud.draw()
+                dirty = True
+            profiler.lap("hud")
+
+        if not dirty:
+            self.skipped_updates += 1
+        # Headless screens count and save every presented frame, so they always update
+        if dirty or isinstance(screen, headless.HeadlessScreen):
+            screen.update()
+        profiler.lap("update")
+        if self._live_queued is not None:
+            self.check_live_caption_shown()
+        now = time.perf_counter()
+        if self.time_to_first_frame is None:
+            self.time_to_first_frame = now - self.created_at
+        if self.quality is not None and self._frame_start is not None:
+            # Frame time covers this frame's simulation steps and its draw
+            if self.quality.observe((now - self._frame_start) * 1000):
+                self.apply_quality(self.quality.settings)
+        self._frame_start = None
+        if profiler.enabled:
+            profiler.end_frame(len(state.smoke), len(screen.getcanvas().find_all()))
+
+    def step(self):
+        # One simulation step and one presented frame, outside the scheduler
+        if not self.built:
+            self.build()
+        self.advance()
+        self.draw()
+
+    def animate_scene(self):
+        if self.frame_scheduler is None:
+            screen = self.screen
+            # Headless runs on the screen's virtual clock so batch renders never wait
+            frame_clock = (lambda: screen.getcanvas().now_ms / 1000) if self.options.headless else time.perf_counter
+            step, render = self.advance, self.draw
+            if self.options.simulation != "inline":
+                # The worker simulates; the scheduler only paces the frames
+                self.start_simulation_worker()
+                step, render = (lambda: None), self.present
+            self.frame_scheduler = FixedStepScheduler(screen, step, render, step_hz=SIMULATION_HZ,
+                                                      target_fps=self.options.fps, clock=frame_clock)
+        self.frame_scheduler.start()
+
+    def run(self):
+        # Build if needed, then hand control to the screen's event loop
+        if not self.built:
+            self.build()
+        self.animate_scene() # Start animation
+        screen = self.screen
+        render_start = time.perf_counter()
+        if self.live_captions:
+            asyncio.run(self.run_with_caption_feed())
+        else:
+            screen.mainloop() # Headless: runs the ontimer loop on a virtual clock, no sleeping
+        render_time = time.perf_counter() - render_start
+        self.stop_simulation_worker()
+        self.profiler.close()
+        return render_time
+
+    async def run_with_caption_feed(self):
+        # asyncio owns the loop: the feed's readers run as tasks while Tk (or
+        # the headless timer loop) is pumped every TK_PUMP_INTERVAL
+        self.caption_feed = CaptionFeed(self.options.caption_queue)
+        if self.options.caption_socket:
+            await self.caption_feed.serve_socket(self.options.caption_socket)
+        if self.options.caption_fifo:
+            await self.caption_feed.read_pipe(self.options.caption_fifo)
+        if self.performance_hud is not None:
+            self.performance_hud.status_lines = self.status_lines()
+        try:
+            while self.pump_screen():
+                await asyncio.sleep(TK_PUMP_INTERVAL)
+        finally:
+            await self.caption_feed.close()
+
+    def pump_screen(self):
+        # One pass of the screen's events and timers; False once it is closed or done
+        screen = self.screen
+        if isinstance(screen, headless.HeadlessScreen):
+            return screen.pump()
+        try:
+            screen.getcanvas().winfo_toplevel().update()
+        except tkinter.TclError: # Window closed
+            return False
+        return True
+
+    def close(self):
+        if self.frame_scheduler is not None:
+            self.frame_scheduler.stop()
+        self.stop_simulation_worker()
+        self.profiler.close()
+
+
+def main(argv=None):
+    options = parse_options(sys.argv[1:] if argv is None else argv)
+    if options.export:
+        options.headless = True # Exports never open a window
+        scene = Scene(options)
+        if not headless.can_paint_text():
+            print(NO_TEXT_WARNING % "exporting frames", file=sys.stderr)
+        export_start = time.perf_counter()
+        written = export.export(scene, options.export, options.duration, options.fps, SIMULATION_HZ,
+                                fmt=options.export_format, workers=options.jobs)
+        export_time = time.perf_counter() - export_start
+        scene.close()
+        print(f"Exported {written} frames to {options.export} in {export_time:.2f}s "
+              f"({written / max(export_time, 1e-9):.1f} FPS)", file=sys.stderr)
+        return
+    if options.poster:
+        options.headless = True
+        options.cache_background = False # Posters scale the vector items, not a baked image
+        options.adaptive = "off"
+        scene = Scene(options)
+        scene.circle_steps = POSTER_CIRCLE_STEPS
+        scene.build()
+        scene.fast_forward(options.poster_frame)
+        scene.draw()
+        if not headless.can_paint_text():
+            print(NO_TEXT_WARNING % "rendering the poster", file=sys.stderr)
+        poster_start = time.perf_counter()
+        width, height = options.poster_size
+        tiles = poster.render_poster(scene.screen.getcanvas().snapshot(), options.poster, width, height,
+                                     tile_size=options.tile_size, workers=options.jobs)
+        poster_time = time.perf_counter() - poster_start
+        scene.close()
+        print(f"Rendered a {width}x{height} poster of step {options.poster_frame} to {options.poster} "
+              f"in {tiles} tiles, {poster_time:.2f}s", file=sys.stderr)
+        return
+    if options.headless and options.out and not headless.can_paint_text():
+        print(NO_TEXT_WARNING % "writing frames", file=sys.stderr)
+    scene = Scene(options)
+    render_time = scene.run()
+    if scene.options.headless:
+        frames = scene.screen.frame_count
+        first_frame = scene.time_to_first_frame
+        print(f"Rendered {frames} frames in {render_time:.2f}s "
+              f"({frames / max(render_time, 1e-9):.1f} FPS), "
+              f"{scene.frame_scheduler.dropped_frames} dropped, "
+              f"first frame after {first_frame * 1000 if first_frame is not None else 0:.1f} ms"
+              + f", {scene.skipped_updates} frames unchanged"
+              + (f", {scene.quality.status()}" if scene.quality is not None else "")
+              + (f", {scene.snapshots} snapshots from the simulation {options.simulation} "
+                 f"({scene.steps_missed} steps not drawn)" if options.simulation != "inline" else "")
+              + (f", {scene.caption_feed.status()}" if scene.caption_feed is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
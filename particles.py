@@ -0,0 +1,255 @@
+import math
+from array import array
+from collections import OrderedDict
+from operator import add
+
+# --- Smoke Particle Store ---
+# Struct-of-arrays particle storage in a fixed-capacity ring buffer.
+#
+# Each attribute lives in its own contiguous array('d'), indexed by slot.
+# Particles are emitted at the head of the ring; when the ring is full the
+# oldest slot is overwritten, which replaces the old list.pop(0) trimming.
+# Particles can die out of order (their lifetimes differ), so dead slots are
+# skipped while iterating and reclaimed once they reach the tail.
+class SmokeParticles:
+    def __init__(self, capacity, initial_alpha=0.7):
+        self.capacity = capacity
+        self.limit = capacity # Soft cap on occupied slots, lowered to shed load
+        self.initial_alpha = initial_alpha
+        zeros = bytes(8 * capacity)
+        self.x = array('d', zeros)
+        self.y = array('d', zeros)
+        self.dx = array('d', zeros)
+        self.dy = array('d', zeros)
+        self.radius = array('d', zeros)
+        self.life = array('d', zeros)
+        self.max_life = array('d', zeros)
+        self.alpha = array('d', zeros) # Derived each update: fading 0..initial_alpha
+        self.size = array('d', zeros)  # Derived each update: current puff radius
+        self.serial = array('q', zeros) # Emission number, stable however slots are reused
+        self.emitted = 0 # Particles emitted so far; the next particle's serial
+        self.start = 0 # Slot of the oldest particle
+        self.count = 0 # Occupied slots, including dead ones not yet reclaimed
+        self.live = 0  # Particles with life left
+
+    def __len__(self):
+        return self.live
+
+    def emit(self, x, y, dx, dy, radius, max_life):
+        cap = self.capacity
+        while self.count >= min(self.limit, cap): # Full: the oldest particle gives way
+            if self.life[self.start] > 0:
+                self.live -= 1
+            self.start = (self.start + 1) % cap
+            self.count -= 1
+        i = (self.start + self.count) % cap
+        self.x[i] = x
+        self.y[i] = y
+        self.dx[i] = dx
+        self.dy[i] = dy
+        self.radius[i] = radius
+        self.life[i] = max_life
+        self.max_life[i] = max_life
+        self.alpha[i] = self.initial_alpha
+        self.size[i] = radius
+        self.serial[i] = self.emitted
+        self.emitted += 1
+        self.count += 1
+        self.live += 1
+
+    def slots(self):
+        # Occupied slot indices, oldest first (may include dead slots)
+        end = self.start + self.count
+        if end <= self.capacity:
+            return range(self.start, end)
+        return _chain_ranges(range(self.start, self.capacity), range(0, end - self.capacity))
+
+    def update(self):
+        # One batched pass: advance position, age, and derive alpha and size.
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+        life, max_life, radius = self.life, self.max_life, self.radius
+        alpha, size = self.alpha, self.size
+        initial_alpha = self.initial_alpha
+        live = 0
+        for i in self.slots():
+            remaining = life[i]
+            if remaining <= 0:
+                continue
+            x[i] += dx[i]
+            y[i] += dy[i]
+            remaining -= 1
+            life[i] = remaining
+            if remaining > 0:
+                fade = remaining / max_life[i]
+                alpha[i] = min(1.0, fade * initial_alpha)
+                size[i] = radius[i] * fade
+                live += 1
+        self.live = live
+        # Reclaim dead slots at the tail of the ring
+        cap = self.capacity
+        while self.count and life[self.start] <= 0:
+            self.start = (self.start + 1) % cap
+            self.count -= 1
+
+    def clear(self):
+        self.start = self.count = self.live = 0
+
+    def copy_from(self, other):
+        # Make this store an exact copy of `other`, reusing its arrays
+        for name in ("x", "y", "dx", "dy", "radius", "life", "max_life", "alpha", "size", "serial"):
+            getattr(self, name)[:] = getattr(other, name)
+        self.capacity = other.capacity
+        self.limit = other.limit
+        self.initial_alpha = other.initial_alpha
+        self.emitted = other.emitted
+        self.start = other.start
+        self.count = other.count
+        self.live = other.live
+
+
+def _chain_ranges(first, second):
+    yield from first
+    yield from second
+
+
+# --- Counter-Based Random Numbers ---
+# A stateless generator: each draw is a pure function of its key (seed,
+# stream, counter...), so any particle's or frame's randomness can be
+# recomputed directly instead of replaying a generator up to that point.
+_MASK64 = (1 << 64) - 1
+
+def counter_hash(*key):
+    # splitmix64 mixing folded over the key; returns a 64-bit integer
+    h = 0
+    for value in key:
+        h = ((h ^ value) + 0x9E3779B97F4A7C15) & _MASK64
+        h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & _MASK64
+        h ^= h >> 31
+    return h
+
+
+def counter_uniform(a, b, *key):
+    return a + (b - a) * (counter_hash(*key) >> 11) / (1 << 53)
+
+
+# --- Puff Geometry Cache ---
+# A smoke puff is three circle arcs traced from the particle position. The
+# outline only depends on radius, alpha (which sets arc extent and turn) and
+# the starting heading, so it is computed once per quantized
+# (radius, alpha, heading) key and kept in a bounded LRU. Coordinates are
+# canvas-relative (y down) and follow turtle.circle's own step count and
+# chord math, so puffs match what the smoke pen used to trace.
+RADIUS_STEP = 0.25    # px
+ALPHA_LEVELS = 32     # per unit alpha
+HEADING_STEP = 10     # degrees
+HEADING_STREAM = 2    # counter_hash stream of the per-frame puff headings
+
+def puff_outline(radius, alpha, heading, arcs=3):
+    extent = 100 + alpha * 20
+    turn = 50 + alpha * 10
+    steps = 1 + int(min(11 + abs(radius) / 6.0, 59.0) * extent / 360)
+    w = extent / steps
+    chord = 2.0 * radius * math.sin(math.radians(w / 2))
+    x = y = 0.0
+    points = [0.0, 0.0]
+    for _ in range(arcs):
+        heading += w / 2
+        for _ in range(steps):
+            rad = math.radians(heading)
+            x += chord * math.cos(rad)
+            y += chord * math.sin(rad)
+            points.append(x)
+            points.append(-y)
+            heading += w
+        heading += turn - w / 2
+    return tuple(points)
+
+
+class PuffCache:
+    def __init__(self, max_entries=2048, arcs=3):
+        self.max_entries = max_entries
+        self.arcs = arcs
+        self._outlines = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Fading gray for every quantized alpha level, as the smoke pen used
+        self.palette = []
+        for level in range(ALPHA_LEVELS + 1):
+            gray = int(200 + level / ALPHA_LEVELS * 50)
+            self.palette.append("#%02x%02x%02x" % (gray, gray, gray))
+
+    def outline(self, radius, alpha_level, heading):
+        key = (round(radius / RADIUS_STEP), alpha_level, round(heading / HEADING_STEP) % (360 // HEADING_STEP), self.arcs)
+        points = self._outlines.get(key)
+        if points is not None:
+            self._outlines.move_to_end(key)
+            self.hits += 1
+            return points
+        self.misses += 1
+        points = puff_outline(key[0] * RADIUS_STEP, alpha_level / ALPHA_LEVELS, key[2] * HEADING_STEP, self.arcs)
+        self._outlines[key] = points
+        if len(self._outlines) > self.max_entries:
+            self._outlines.popitem(last=False)
+        return points
+
+    def clear(self):
+        self._outlines.clear()
+
+
+# --- Retained Smoke Layer ---
+# One canvas line item per visible puff, pooled across frames: each frame the
+# k-th visible particle reuses the k-th item, gets the cached outline
+# translated to its position, and unused items are hidden. Puffs start at a
+# fresh heading every frame, hashed from (seed, particle serial, frame) so a
+# given frame always looks the same. Particle positions are relative to
+# `origin`.
+class SmokeLayer:
+    def __init__(self, screen, cache=None):
+        self.cv = screen.getcanvas()
+        self.cache = cache or PuffCache()
+        self.items = []
+        self._colors = []  # Fill each pooled item currently has
+        self.visible = 0  # Items in use after the last draw
+
+    def draw(self, particles, frame=0, seed=0, origin=(0, 0)):
+        cv = self.cv
+        cache = self.cache
+        palette = cache.palette
+        x, y = particles.x, particles.y
+        life, alpha, size, serial = particles.life, particles.alpha, particles.size, particles.serial
+        ox, oy = origin
+        used = 0
+        for i in particles.slots():
+            if life[i] <= 0:
+                continue
+            current_radius = size[i]
+            if current_radius <= 0.5: # Only draw if reasonably visible
+                continue
+            level = round(alpha[i] * ALPHA_LEVELS)
+            heading = counter_hash(seed, HEADING_STREAM, serial[i], frame) % 361
+            outline = cache.outline(current_radius, level, heading)
+            coords = list(map(add, outline, (ox + x[i], -oy - y[i]) * (len(outline) // 2)))
+            color = palette[level]
+            if used == len(self.items):
+                self.items.append(cv.create_line(*coords, fill=color, width=1, capstyle="round"))
+                self._colors.append(color)
+            else:
+                item = self.items[used]
+                cv.coords(item, *coords)
+                if self._colors[used] != color:
+                    cv.itemconfigure(item, fill=color)
+                    self._colors[used] = color
+                if used >= self.visible:
+                    cv.itemconfigure(item, state="normal")
+            used += 1
+        for k in range(used, self.visible):
+            cv.itemconfigure(self.items[k], state="hidden")
+        self.visible = used
+
+    def clear(self):
+        for item in self.items:
+            self.cv.delete(item)
+        self.items = []
+        self._colors = []
+        self.visible = 0
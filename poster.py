@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import headless
+from export import bounded_map
+
+# --- Poster Rendering ---
+# Renders one frame's display list at any size. The vector items are scaled
+# up (so nothing is upsampled) and the picture is cut into tiles that pool
+# processes rasterize independently: each worker receives the display list
+# once and then only tile coordinates. Tiles come back in reading order; as
+# soon as a band (one row of tiles) is complete its rows are compressed into
+# the output file and dropped. Memory holds that one band, poster width x
+# tile size x 3 bytes (about 11 MB at 7200 pixels wide and 512 pixel tiles),
+# plus the tiles in flight; it does not grow with the poster's height.
+#
+# The picture is scaled uniformly to fit and centred; any margin shows the
+# canvas background. Like every headless render, the caption is painted only
+# with Pillow and a CJK font.
+POSTER_FORMATS = ("png", "ppm")
+
+_canvas = None # The display list, in each worker process
+
+def _init_worker(canvas):
+    global _canvas
+    _canvas = canvas
+
+
+def render_tile(job):
+    # Runs in a pool process: one tile of the scaled picture
+    scale, origin, left, top, width, height = job
+    return headless.rasterize(_canvas, width, height, scale, origin, left, top)
+
+
+def tiles(width, height, tile_size):
+    # (left, top, width, height) of every tile, band by band
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            yield left, top, min(tile_size, width - left), min(tile_size, height - top)
+
+
+def render_poster(canvas, path, width, height, tile_size=512, workers=None, progress=None):
+    # Returns the number of tiles rendered
+    fmt = "ppm" if path.endswith(".ppm") else "png"
+    scale = min(width / canvas.width, height / canvas.height)
+    origin = (width / 2, height / 2)
+    workers = workers or os.cpu_count() or 1
+    layout = list(tiles(width, height, tile_size))
+    jobs = ((scale, origin) + tile for tile in layout)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        if fmt == "png":
+            writer = headless.PNGWriter(f, width, height)
+            write_rows = writer.write_rows
+        else:
+            f.write(b"P6\n%d %d\n255\n" % (width, height))
+            write_rows = f.write
+        if workers == 1:
+            _init_worker(canvas)
+            executor = None
+            results = map(render_tile, jobs)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(canvas,))
+            results = bounded_map(executor, render_tile, jobs, 2 * workers)
+        try:
+            band = [] # Tiles of the band being assembled
+            for done, ((left, top, tile_width, tile_height), pixels) in enumerate(zip(layout, results), 1):
+                band.append((tile_width, pixels))
+                if left + tile_width == width: # Band complete: interleave its rows
+                    for row in range(tile_height):
+                        write_rows(b"".join(pixels[row * w * 3:(row + 1) * w * 3] for w, pixels in band))
+                    band = []
+                if progress:
+                    progress(done, len(layout))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        if fmt == "png":
+            writer.close()
+    return len(layout)
@@ -0,0 +1,104 @@
+import csv
+import time
+import turtle
+from collections import deque
+
+# --- Per-Subsystem Frame Profiler ---
+# Lap timer over the stages of a frame. Call lap_start() at the top of a block
+# of work and lap(stage) after each subsystem; time between marks is added to
+# that stage for the current frame. Several simulation steps per frame simply
+# accumulate. end_frame() closes the sample, keeps it in a rolling window for
+# p50/p95/max and optionally appends it to a CSV file.
+STAGES = ("smoke", "window", "village", "sun", "couple", "caption", "update", "hud")
+
+class FrameProfiler:
+    def __init__(self, enabled=True, window=120, csv_path=None, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.frame = 0
+        self.current = dict.fromkeys(STAGES, 0.0)
+        self.history = {name: deque(maxlen=window) for name in STAGES + ("total",)}
+        self.particles = 0
+        self.canvas_items = 0
+        self._last = 0.0
+        self._csv_file = None
+        self._csv = None
+        if enabled and csv_path:
+            self._csv_file = open(csv_path, "w", newline="")
+            self._csv = csv.writer(self._csv_file)
+            self._csv.writerow(("frame",) + tuple(name + "_ms" for name in STAGES)
+                               + ("total_ms", "smoke_particles", "canvas_items"))
+
+    def lap_start(self):
+        if self.enabled:
+            self._last = self.clock()
+
+    def lap(self, stage):
+        if self.enabled:
+            now = self.clock()
+            self.current[stage] += now - self._last
+            self._last = now
+
+    def end_frame(self, particles, canvas_items):
+        if not self.enabled:
+            return
+        self.frame += 1
+        self.particles = particles
+        self.canvas_items = canvas_items
+        total = 0.0
+        for name in STAGES:
+            ms = self.current[name] * 1000
+            self.history[name].append(ms)
+            total += ms
+            self.current[name] = 0.0
+        self.history["total"].append(total)
+        if self._csv is not None:
+            last = [self.history[name][-1] for name in STAGES]
+            self._csv.writerow([self.frame] + ["%.4f" % ms for ms in last]
+                               + ["%.4f" % total, particles, canvas_items])
+
+    def summary(self):
+        # stage -> (p50, p95, max) in ms over the rolling window
+        result = {}
+        for name, samples in self.history.items():
+            if samples:
+                ordered = sorted(samples)
+                n = len(ordered)
+                result[name] = (ordered[(n - 1) // 2], ordered[min(n - 1, int(n * 0.95))], ordered[-1])
+        return result
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = self._csv = None
+
+
+# --- On-Screen Performance HUD ---
+class PerformanceHUD:
+    # Draws the profiler summary with its own pen, refreshed every
+    # `refresh_frames` frames so the overlay itself stays cheap.
+    def __init__(self, screen, profiler, x, y, refresh_frames=10, color="darkslategray"):
+        self.profiler = profiler
+        self.x = x
+        self.y = y
+        self.refresh_frames = refresh_frames
+        self.pen = turtle.RawTurtle(screen)
+        self.pen.speed(0)
+        self.pen.hideturtle()
+        self.pen.penup()
+        self.pen.pencolor(color)
+        self.status_lines = [] # Extra lines other components want on the overlay
+
+    def draw(self):
+        if self.profiler.frame % self.refresh_frames:
+            return
+        lines = ["%-8s %6s %6s %6s" % ("ms", "p50", "p95", "max")]
+        summary = self.profiler.summary()
+        for name in STAGES + ("total",):
+            if name in summary:
+                lines.append("%-8s %6.2f %6.2f %6.2f" % ((name,) + summary[name]))
+        lines.append("smoke %d  items %d" % (self.profiler.particles, self.profiler.canvas_items))
+        lines.extend(self.status_lines)
+        self.pen.clear()
+        self.pen.goto(self.x, self.y)
+        self.pen.write("\n".join(lines), align="right", font=("Courier", 9, "normal"))
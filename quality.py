@@ -0,0 +1,55 @@
+from collections import deque
+
+# --- Adaptive Level of Detail ---
+# Watches measured frame times against the frame budget and steps the scene's
+# detail down when frames run long and back up when there is headroom. Two
+# thresholds (downgrade above the budget, upgrade only below `headroom` of
+# it) plus a cooldown after every change keep it from oscillating.
+#
+# Levels go from cheapest to richest; the last one is the full scene.
+# smoke_share is the fraction of --max-smoke puffs a level keeps alive.
+LEVELS = (
+    {'name': "low", 'smoke_interval': 15, 'smoke_share': 1 / 6, 'puff_arcs': 1, 'num_rays': 6, 'circle_steps': 12},
+    {'name': "medium", 'smoke_interval': 10, 'smoke_share': 1 / 3, 'puff_arcs': 2, 'num_rays': 8, 'circle_steps': 24},
+    {'name': "high", 'smoke_interval': 7, 'smoke_share': 2 / 3, 'puff_arcs': 3, 'num_rays': 12, 'circle_steps': None},
+    {'name': "full", 'smoke_interval': 5, 'smoke_share': 1.0, 'puff_arcs': 3, 'num_rays': 12, 'circle_steps': None},
+)
+
+class QualityController:
+    def __init__(self, budget_ms=50.0, levels=LEVELS, level=None, window=30, headroom=0.6, cooldown=60):
+        self.budget_ms = budget_ms
+        self.levels = levels
+        self.level = len(levels) - 1 if level is None else level
+        self.headroom = headroom
+        self.cooldown = cooldown # Frames to wait after a change before judging again
+        self.samples = deque(maxlen=window)
+        self.changes = 0
+        self._hold = 0
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def observe(self, frame_ms):
+        # Feed one frame's time; returns True when the level changed
+        self.samples.append(frame_ms)
+        if self._hold:
+            self._hold -= 1
+            return False
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        ordered = sorted(self.samples)
+        p90 = ordered[int(len(ordered) * 0.9)]
+        if p90 > self.budget_ms and self.level > 0:
+            self.level -= 1
+        elif p90 < self.budget_ms * self.headroom and self.level < len(self.levels) - 1:
+            self.level += 1
+        else:
+            return False
+        self.samples.clear() # Judge the new level on its own frames
+        self._hold = self.cooldown
+        self.changes += 1
+        return True
+
+    def status(self):
+        return "quality %s (%d/%d)" % (self.settings['name'], self.level, len(self.levels) - 1)
@@ -0,0 +1,152 @@
+import hashlib
+import inspect
+import json
+import os
+import tkinter
+import tomllib
+import turtle
+
+import canvaspen
+import headless
+import sprites
+
+# --- Scene Files ---
+# A scene file describes the static layout as data instead of code: the sky
+# color plus a list of elements (sun, ground, cabin, tree, fence, couple)
+# with their positions, sizes and colors. JSON or TOML:
+#
+#   {"sky": "#E0F7FA",
+#    "elements": [{"type": "sun", "x": -330, "y": 230, "radius": 40},
+#                 {"type": "cabin", "x": -75, "y": -150}, ...]}
+#
+# compile_scene() runs the drawing helpers once on an offscreen canvas and
+# flattens the result into a display list of canvas primitives, plus the
+# layout the animation needs (chimney, window, sun, couple). The compiled form
+# is cached on disk as JSON, keyed by a hash of the file, the circle
+# resolution, the drawing backend and the helpers' source, so later starts
+# skip the drawing code entirely and create the items in bulk.
+FORMAT_VERSION = 2 # Bump when the compiled format changes
+
+ELEMENT_FIELDS = {
+    # type -> (helper arguments after the pen, optional ones with defaults)
+    "sun": (("x", "y", "radius"), {'color': "gold"}),
+    "ground": ((), {}),
+    "cabin": (("x", "y"), {}),
+    "tree": (("x", "y"), {'variant': 0}),
+    "fence": (("x", "y"), {'sections': 4, 'section_width': 30, 'post_height': 40}),
+    "couple": (("x", "y"), {}), # Animated: only its position is compiled
+}
+COLOR_FIELDS = ("color",) # Element fields holding a Tk color
+
+
+def is_color(value):
+    # Any color Tk accepts; the offscreen compile uses the headless table
+    if not isinstance(value, str):
+        return False
+    try:
+        headless.parse_color(value)
+    except tkinter.TclError:
+        return False
+    return True
+
+
+def default_cache_dir():
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "turtle_home", "scenes")
+
+
+def parse_scene(data, path=""):
+    # Scene file bytes -> description dict, checked against ELEMENT_FIELDS
+    if path.endswith(".toml"):
+        description = tomllib.loads(data.decode("utf-8"))
+    else:
+        description = json.loads(data)
+    sky = description.get("sky")
+    if sky is not None and not is_color(sky):
+        raise ValueError("%s: sky has unknown color %r" % (path, sky))
+    for index, element in enumerate(description.get("elements", [])):
+        kind = element.get("type")
+        if kind not in ELEMENT_FIELDS:
+            raise ValueError("%s: element %d has unknown type %r" % (path, index, kind))
+        missing = [name for name in ELEMENT_FIELDS[kind][0] if name not in element]
+        if missing:
+            raise ValueError("%s: %s element %d is missing %s" % (path, kind, index, ", ".join(missing)))
+        for name in COLOR_FIELDS:
+            if name in element and not is_color(element[name]):
+                raise ValueError("%s: %s element %d has unknown %s %r" % (path, kind, index, name, element[name]))
+    return description
+
+
+def compile_scene(description, helpers, steps=None, backend="turtle"):
+    # Draw every element with its helper (type -> drawing function) onto an
+    # offscreen canvas; returns {'sky', 'items', 'layout'}
+    offscreen, t = canvaspen.offscreen_pen(backend)
+    layout = {}
+    for element in description.get("elements", []):
+        kind = element["type"]
+        required, optional = ELEMENT_FIELDS[kind]
+        args = [element[name] for name in required] + [element.get(name, default) for name, default in optional.items()]
+        if kind == "couple":
+            layout.setdefault("couple", args)
+        elif kind == "sun":
+            helpers[kind](t, *args, steps=steps)
+            layout.setdefault("sun", args)
+        elif kind == "tree":
+            helpers[kind](t, *args, steps=steps)
+        elif kind == "cabin":
+            cabin_width, smoke_x, smoke_y, window = helpers[kind](t, *args)
+            if "chimney" not in layout: # The first cabin is the animated one
+                layout["chimney"] = [smoke_x, smoke_y]
+                layout["window"] = list(window)
+        else:
+            helpers[kind](t, *args)
+    offscreen.update()
+    items = [[kind, list(coords), options] for kind, coords, options in sprites.drawn_items(offscreen.cv)]
+    canvaspen.release(offscreen)
+    return {'sky': description.get("sky"), 'items': items, 'layout': layout}
+
+
+def cache_key(data, helpers, steps, backend="turtle"):
+    digest = hashlib.sha256()
+    digest.update(b"%d %r %s\n" % (FORMAT_VERSION, steps, backend.encode()))
+    digest.update(data)
+    # Editing a drawing helper, or the pens and canvas that record what it
+    # draws (turtle itself included), changes what a scene compiles to
+    sources = {inspect.getsourcefile(helper) for helper in helpers.values()}
+    sources.update(inspect.getsourcefile(module) for module in (canvaspen, headless, sprites, turtle))
+    for source in sorted(sources):
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_scene(path, helpers, steps=None, cache_dir=None, backend="turtle"):
+    # The compiled scene for `path`, from the cache when it is current.
+    # Returns (compiled, True if it came from the cache).
+    with open(path, "rb") as f:
+        data = f.read()
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = os.path.join(cache_dir, cache_key(data, helpers, steps, backend) + ".json")
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f), True
+    except (OSError, ValueError):
+        pass # Not compiled yet, or unreadable: compile again
+    compiled = compile_scene(parse_scene(data, path), helpers, steps, backend)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        partial = "%s.%d.tmp" % (cache_path, os.getpid())
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(compiled, f, separators=(",", ":"))
+        os.replace(partial, cache_path) # Readers never see a half-written file
+    except OSError:
+        pass # A read-only cache only costs the compile on the next start
+    return compiled, False
+
+
+def draw_display_list(screen, pen, items):
+    # Create every item directly on the canvas. They join `pen`'s items, so
+    # clearing the pen, baking the background and restacking the static
+    # layer treat them like anything the pen drew itself.
+    cv = screen.getcanvas()
+    for kind, coords, options in items:
+        pen.items.append(sprites.create_item(cv, kind, coords, **options))
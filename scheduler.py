@@ -0,0 +1,84 @@
+import math
+import time
+
+_EPSILON = 1e-9 # Float slack when comparing the accumulator with whole steps
+
+# --- Fixed-Timestep Frame Scheduler ---
+# Runs the simulation in fixed steps of 1/step_hz seconds, however long a
+# frame actually takes. Each tick measures the time since the previous one,
+# runs as many steps as that time covers (catch-up), renders once, and sleeps
+# only for what is left of the frame budget.
+#
+# All of the scene's animation constants are counted in steps, so motion
+# speed depends only on step_hz. target_fps only sets how often a frame is
+# presented; frames beyond step_hz would show nothing new, so it may not
+# exceed it. Below step_hz each frame covers step_hz / target_fps steps; only
+# steps beyond that (and a discarded backlog) count as dropped frames, and a
+# tick gives up on the backlog only after max_catch_up steps beyond them.
+class FixedStepScheduler:
+    def __init__(self, screen, step, render, step_hz=20, target_fps=20,
+                 max_catch_up=5, clock=time.perf_counter):
+        self.screen = screen
+        self.step = step
+        self.render = render
+        if not 0 < target_fps <= step_hz:
+            raise ValueError("target_fps must be above 0 and at most step_hz (%g)" % step_hz)
+        self.step_dt = 1.0 / step_hz
+        self.frame_dt = 1.0 / target_fps
+        self.steps_per_frame = math.ceil(step_hz / target_fps - _EPSILON) # Steps a frame may cover without a drop
+        self.max_catch_up = max_catch_up # Steps past a frame's own before giving up on the backlog
+        self.max_steps = self.steps_per_frame + max_catch_up # Steps per tick
+        self.clock = clock
+        self.accumulator = 0.0
+        self.last_time = None
+        self.last_frame_time = 0.0
+        self.steps = 0
+        self.frames = 0
+        self.dropped_frames = 0 # Steps simulated but never presented, or skipped outright
+        self.wakeups = 0
+        self.running = False
+
+    def start(self):
+        # The first frame is simulated and drawn right away
+        self.running = True
+        self.last_time = self.clock()
+        self.accumulator = self.step_dt
+        self.tick()
+
+    def stop(self):
+        self.running = False
+
+    def tick(self):
+        if not self.running:
+            return
+        now = self.clock()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        self.wakeups += 1
+
+        steps = 0
+        while self.accumulator >= self.step_dt - _EPSILON and steps < self.max_steps:
+            self.step()
+            self.accumulator -= self.step_dt
+            steps += 1
+        if self.accumulator >= self.step_dt - _EPSILON:
+            # Too far behind to catch up (e.g. the window was dragged): drop
+            # the backlog rather than fast-forwarding through it
+            backlog = int(self.accumulator / self.step_dt)
+            self.accumulator -= backlog * self.step_dt
+            self.dropped_frames += backlog
+        if steps:
+            self.steps += steps
+            self.dropped_frames += max(0, steps - self.steps_per_frame)
+            self.render()
+            self.frames += 1
+            self.last_frame_time = now
+
+        # Sleep until both the next step is due and the frame budget is spent
+        wake = max(now + self.step_dt - self.accumulator, self.last_frame_time + self.frame_dt)
+        delay = wake - self.clock()
+        self.screen.ontimer(self.tick, max(1, round(delay * 1000)))
+
+    def stats(self):
+        return {'steps': self.steps, 'frames': self.frames, 'dropped_frames': self.dropped_frames,
+                'wakeups': self.wakeups}
@@ -0,0 +1,269 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from particles import SmokeParticles, counter_uniform, counter_hash
+
+# --- Scene Simulation ---
+# Everything that changes over time, with no drawing. A SceneState is
+# advanced one fixed step at a time by step() (or one subsystem at a time by
+# the step_* functions) and the renderer only reads it. Positions are relative
+# to the layout: smoke to the chimney top, the couple to its home position.
+#
+# All randomness is counter-based (see particles.counter_hash): particle n's
+# attributes depend only on (seed, n), so a state can be reproduced exactly at
+# any frame, and fast_forward() jumps there without replaying every step.
+
+# --- Timing (all per step; tuned for 20 steps per second) ---
+SMOKE_CREATION_INTERVAL = 5 # Create smoke every N steps
+SMOKE_MIN_LIFE = 80
+SMOKE_MAX_LIFE = 150
+WINDOW_FLICKER_INTERVAL = 15 # Flicker every N steps (e.g., 15 steps = 0.75 seconds)
+SUN_RAY_FLICKER_INTERVAL = 8 # Flicker rays every N steps
+COUPLE_MOVEMENT_RANGE = 60 # Total range of horizontal movement
+COUPLE_SPEED = 0.5   # Movement speed (pixels per step)
+TEXT_ANIMATION_INTERVAL = 5 # Steps per character (slower)
+TEXT_HOLD_INTERVAL = 30 # Steps to hold text after full display
+
+# --- Village (see village.py) ---
+VILLAGE_PAN_SPEED = 1.5 # Camera pan across a village (pixels per step)
+EMITTER_MARGIN = 60 # Chimneys this far outside the view keep smoking; their puffs drift in
+
+SMOKE_STREAM = 1 # counter_hash stream of the particle attributes
+VILLAGE_SMOKE_STREAM = 3
+
+
+class Emitters:
+    # The chimneys of a village in world coordinates, sorted by x so the ones
+    # near the view are found by bisection. Each has a phase that staggers its
+    # puffs against its neighbours'.
+    def __init__(self, points):
+        points = sorted(points)
+        self.x = array('d', [p[0] for p in points])
+        self.y = array('d', [p[1] for p in points])
+        self.phase = array('l', [p[2] for p in points])
+
+    def __len__(self):
+        return len(self.x)
+
+
+class SceneState:
+    def __init__(self, seed, caption_lengths, smoke_capacity=60, caption_count=None):
+        self.seed = seed
+        self.frame = 0 # Steps taken
+        self.smoke = SmokeParticles(smoke_capacity)
+        self.smoke_interval = SMOKE_CREATION_INTERVAL # Lowered detail emits less often
+        self.window_color_index = 0
+        self.long_rays = True
+        self.couple_offset = 0.0 # From the couple's home x
+        self.couple_dx = COUPLE_SPEED
+        self.caption_lengths = list(caption_lengths)
+        # The first caption_count captions rotate; any after them are live
+        # slots, shown once each when queued (see queue_caption)
+        self.caption_count = len(self.caption_lengths) if caption_count is None else caption_count
+        self.caption_index = 0
+        self.rotation_index = 0 # Caption the rotation is at, while a live one shows
+        self.next_caption = None # Live caption to show after the current one
+        self.char_index = 0 # Characters of the current caption shown
+        self.text_animation_frame_count = 0
+        self.text_hold_frame_count = 0
+        # A village has many chimneys (then smoke is in world coordinates)
+        # and a camera panning across it; None is the single cabin
+        self.emitters = None
+        self.world = (0.0, 0.0) # Village extent in x
+        self.view_width = 800
+
+
+def copy_state(state, into=None):
+    # A snapshot of `state` for a renderer on another thread; reuses the
+    # arrays of `into` when given. Emitters and caption lengths never change
+    # after the build, so they are shared rather than copied.
+    if into is None:
+        into = SceneState(state.seed, state.caption_lengths, smoke_capacity=state.smoke.capacity,
+                          caption_count=state.caption_count)
+    for name, value in vars(state).items():
+        if name != "smoke":
+            setattr(into, name, value)
+    into.smoke.copy_from(state.smoke)
+    return into
+
+
+def queue_caption(state, index, length):
+    # Show caption `index`, now `length` characters long, after the current one.
+    # The lengths list is replaced, not changed: snapshots share it.
+    lengths = list(state.caption_lengths)
+    lengths[index] = length
+    state.caption_lengths = lengths
+    state.next_caption = index
+
+
+def set_detail(state, smoke_interval, smoke_limit):
+    # Detail settings chosen by the renderer (see quality.py)
+    state.smoke_interval = smoke_interval
+    state.smoke.limit = smoke_limit
+
+
+# --- Subsystems ---
+def emit_smoke(state):
+    # The next particle, drawn from its own serial number
+    smoke = state.smoke
+    n = smoke.emitted
+    seed = state.seed
+    smoke.emit(
+        counter_uniform(-2, 2, seed, SMOKE_STREAM, n, 0),
+        counter_uniform(-2, 2, seed, SMOKE_STREAM, n, 1),
+        counter_uniform(-0.3, 0.3, seed, SMOKE_STREAM, n, 2), # Horizontal drift
+        counter_uniform(0.5, 1.2, seed, SMOKE_STREAM, n, 3),  # Vertical speed
+        counter_uniform(3, 6, seed, SMOKE_STREAM, n, 4),      # Radius
+        SMOKE_MIN_LIFE + counter_hash(seed, SMOKE_STREAM, n, 5) % (SMOKE_MAX_LIFE - SMOKE_MIN_LIFE + 1) # Steps to live
+    )
+
+
+def camera_x(state):
+    # World x at the centre of the view: pans back and forth across a village
+    if state.emitters is None:
+        return 0.0
+    lo = state.world[0] + state.view_width / 2
+    hi = state.world[1] - state.view_width / 2
+    span = hi - lo
+    if span <= 0:
+        return (lo + hi) / 2
+    travelled = (state.frame * VILLAGE_PAN_SPEED) % (2 * span)
+    return lo + (travelled if travelled <= span else 2 * span - travelled)
+
+
+def emit_village_smoke(state):
+    # One batched pass over the chimneys near the view whose turn it is
+    emitters = state.emitters
+    smoke = state.smoke
+    seed = state.seed
+    frame = state.frame
+    interval = state.smoke_interval
+    centre = camera_x(state)
+    reach = state.view_width / 2 + EMITTER_MARGIN
+    for i in range(bisect_left(emitters.x, centre - reach), bisect_right(emitters.x, centre + reach)):
+        if (frame + emitters.phase[i]) % interval:
+            continue
+        smoke.emit(
+            emitters.x[i] + counter_uniform(-2, 2, seed, VILLAGE_SMOKE_STREAM, i, frame, 0),
+            emitters.y[i] + counter_uniform(-2, 2, seed, VILLAGE_SMOKE_STREAM, i, frame, 1),
+            counter_uniform(-0.3, 0.3, seed, VILLAGE_SMOKE_STREAM, i, frame, 2),
+            counter_uniform(0.5, 1.2, seed, VILLAGE_SMOKE_STREAM, i, frame, 3),
+            counter_uniform(3, 6, seed, VILLAGE_SMOKE_STREAM, i, frame, 4),
+            SMOKE_MIN_LIFE + counter_hash(seed, VILLAGE_SMOKE_STREAM, i, frame, 5) % (SMOKE_MAX_LIFE - SMOKE_MIN_LIFE + 1)
+        )
+
+
+def step_smoke(state):
+    if state.emitters is not None:
+        emit_village_smoke(state)
+    elif state.frame % state.smoke_interval == 0:
+        emit_smoke(state) # Ring buffer drops the oldest when full
+    state.smoke.update() # Batched position, life and alpha update
+
+
+def step_window(state):
+    if state.frame % WINDOW_FLICKER_INTERVAL == 0:
+        state.window_color_index = 1 - state.window_color_index # Toggle 0 and 1
+
+
+def step_sun(state):
+    if state.frame % SUN_RAY_FLICKER_INTERVAL == 0:
+        state.long_rays = not state.long_rays
+
+
+def step_couple(state):
+    state.couple_offset += state.couple_dx
+    if abs(state.couple_offset) >= COUPLE_MOVEMENT_RANGE / 2:
+        state.couple_dx = -state.couple_dx # Reverse direction
+
+
+def step_caption(state):
+    length = state.caption_lengths[state.caption_index]
+    if state.char_index < length:
+        # Typing out the text
+        state.text_animation_frame_count += 1
+        if state.text_animation_frame_count % TEXT_ANIMATION_INTERVAL == 0:
+            state.char_index += 1
+    else: # Text is fully displayed, hold it
+        state.text_hold_frame_count += 1
+        if state.text_hold_frame_count >= TEXT_HOLD_INTERVAL:
+            # Switch to a queued live caption, or else the next one in rotation
+            if state.next_caption is not None:
+                state.caption_index = state.next_caption
+                state.next_caption = None
+            else:
+                state.rotation_index = (state.rotation_index + 1) % state.caption_count
+                state.caption_index = state.rotation_index
+            state.char_index = 0
+            state.text_animation_frame_count = 0
+            state.text_hold_frame_count = 0
+
+
+def step(state):
+    # Advance `state` by one step, in place; returns it
+    state.frame += 1
+    step_smoke(state)
+    step_window(state)
+    step_sun(state)
+    step_couple(state)
+    step_caption(state)
+    return state
+
+
+# --- Fast Forward ---
+def _seek_periodic(state, frame):
+    # Closed form of every subsystem except smoke at absolute step `frame`
+    state.frame = frame
+    state.window_color_index = (frame // WINDOW_FLICKER_INTERVAL) % 2
+    state.long_rays = (frame // SUN_RAY_FLICKER_INTERVAL) % 2 == 0
+
+    # The couple walks a triangle wave: k steps out, 2k back, k home
+    k = COUPLE_MOVEMENT_RANGE / 2 / COUPLE_SPEED
+    if k == int(k):
+        k = int(k)
+        m = frame % (4 * k)
+        if m <= k:
+            state.couple_offset = m * COUPLE_SPEED
+        elif m <= 3 * k:
+            state.couple_offset = (2 * k - m) * COUPLE_SPEED
+        else:
+            state.couple_offset = (m - 4 * k) * COUPLE_SPEED
+        state.couple_dx = -COUPLE_SPEED if k <= m < 3 * k else COUPLE_SPEED
+    else: # Bounds not a whole number of steps away: walk it
+        state.couple_offset = 0.0
+        state.couple_dx = COUPLE_SPEED
+        for _ in range(frame):
+            step_couple(state)
+
+    # Caption i shows for TEXT_ANIMATION_INTERVAL steps per character, then
+    # holds (live captions are not replayed)
+    durations = [length * TEXT_ANIMATION_INTERVAL + TEXT_HOLD_INTERVAL
+                 for length in state.caption_lengths[:state.caption_count]]
+    t = frame % sum(durations)
+    index = 0
+    while t >= durations[index]:
+        t -= durations[index]
+        index += 1
+    typing = state.caption_lengths[index] * TEXT_ANIMATION_INTERVAL
+    state.caption_index = state.rotation_index = index
+    state.next_caption = None
+    state.char_index = min(t, typing) // TEXT_ANIMATION_INTERVAL
+    state.text_animation_frame_count = min(t, typing)
+    state.text_hold_frame_count = max(0, t - typing)
+
+
+def fast_forward(state, steps):
+    # Same result as calling step() `steps` times. Long jumps set the periodic
+    # subsystems directly and only replay the last SMOKE_MAX_LIFE steps, as
+    # no particle emitted earlier is still alive (exact as long as the smoke
+    # interval stays fixed and the store never has to drop live particles,
+    # i.e. its limit is at least SMOKE_MAX_LIFE / smoke_interval).
+    target = state.frame + steps
+    if steps > 2 * SMOKE_MAX_LIFE:
+        start = target - SMOKE_MAX_LIFE
+        _seek_periodic(state, start)
+        state.smoke.clear()
+        state.smoke.emitted = start // state.smoke_interval
+    while state.frame < target:
+        step(state)
+    return state
@@ -0,0 +1,153 @@
+import multiprocessing
+import queue
+import threading
+import time
+
+import simulation
+
+# --- Simulation Off the Main Thread ---
+# Runs simulation.step() on a worker thread or process at its own fixed rate
+# and publishes a snapshot of the state after every batch of steps. The Tk
+# main loop only picks up the newest snapshot and draws it, so a slow step
+# never holds up input handling or redraws, and a slow frame never holds up
+# the simulation.
+#
+# The worker owns the authoritative SceneState. Anything the main thread
+# wants to change (detail settings, a fast forward) is sent as a command,
+# a module-level function called as func(state, *args) between steps.
+#
+# Thread: snapshots are handed over through a SnapshotBuffer, a double buffer
+# with one spare so that neither side ever waits for the other's copy or
+# draw, only for a pointer swap. Process: the worker sends a pickled snapshot
+# whenever the main process has taken the previous one, so at most one is in
+# flight while the next is being simulated.
+MAX_CATCH_UP = 5 # Steps per wakeup before the worker drops its backlog
+
+
+class SnapshotBuffer:
+    def __init__(self, state):
+        self._back = simulation.copy_state(state)   # Written by the worker
+        self._middle = simulation.copy_state(state) # Newest complete snapshot
+        self._front = simulation.copy_state(state)  # Being drawn by the reader
+        self._fresh = False # Middle is newer than front
+        self._lock = threading.Lock()
+        self.published = 0
+        self.overwritten = 0 # Snapshots replaced before the reader took them
+
+    def publish(self, state):
+        simulation.copy_state(state, self._back)
+        with self._lock:
+            self._back, self._middle = self._middle, self._back
+            if self._fresh:
+                self.overwritten += 1
+            self._fresh = True
+            self.published += 1
+
+    def latest(self):
+        # The newest snapshot; it stays untouched until the next call
+        with self._lock:
+            if self._fresh:
+                self._front, self._middle = self._middle, self._front
+                self._fresh = False
+        return self._front
+
+
+def run_steps(state, step_hz, publish, pending_commands, stop, clock=time.perf_counter):
+    # The worker loop: fixed steps on the worker's own clock, commands
+    # applied between steps, one publish per batch
+    step_dt = 1.0 / step_hz
+    next_step = clock()
+    while not stop.is_set():
+        for func, args in pending_commands():
+            func(state, *args)
+        now = clock()
+        steps = 0
+        while now >= next_step and steps < MAX_CATCH_UP:
+            simulation.step(state)
+            next_step += step_dt
+            steps += 1
+        if now >= next_step: # Too far behind: drop the backlog
+            next_step = now + step_dt
+        if steps:
+            publish(state)
+        stop.wait(max(0.0, next_step - clock()))
+
+
+class SimulationThread:
+    def __init__(self, state, step_hz):
+        self.buffer = SnapshotBuffer(state)
+        self._commands = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=run_steps, name="simulation", daemon=True,
+                                        args=(state, step_hz, self.buffer.publish, self._pending, self._stop))
+
+    def _pending(self):
+        commands = []
+        while not self._commands.empty():
+            commands.append(self._commands.get_nowait())
+        return commands
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, func, *args):
+        self._commands.put((func, args))
+
+    def latest(self):
+        return self.buffer.latest()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _process_main(state, step_hz, snapshots, commands, wanted, stop):
+    # Entry point of the simulation process
+    def publish(state):
+        if wanted.is_set(): # The main process took the previous snapshot
+            wanted.clear()
+            snapshots.send(state)
+
+    def pending():
+        received = []
+        while commands.poll():
+            received.append(commands.recv())
+        return received
+
+    run_steps(state, step_hz, publish, pending, stop)
+    snapshots.close()
+
+
+class SimulationProcess:
+    def __init__(self, state, step_hz):
+        # Spawned rather than forked: the child must not inherit a Tk interpreter
+        context = multiprocessing.get_context("spawn")
+        self._snapshots, snapshots = context.Pipe(duplex=False)
+        commands, self._commands = context.Pipe(duplex=False)
+        self._wanted = context.Event()
+        self._wanted.set()
+        self._stop = context.Event()
+        self._state = state # Shown until the first snapshot arrives
+        self._process = context.Process(target=_process_main, name="simulation", daemon=True,
+                                        args=(state, step_hz, snapshots, commands, self._wanted, self._stop))
+
+    def start(self):
+        self._process.start()
+
+    def submit(self, func, *args):
+        self._commands.send((func, args))
+
+    def latest(self):
+        if self._snapshots.poll():
+            self._state = self._snapshots.recv()
+            self._wanted.set()
+        return self._state
+
+    def stop(self):
+        self._stop.set()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+
+WORKERS = {"thread": SimulationThread, "process": SimulationProcess}
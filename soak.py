@@ -0,0 +1,169 @@
+import argparse
+import csv
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# --- Soak Test ---
+# Runs the real animation loop (Scene.animate_scene under the screen's main
+# loop) for a long stretch and watches for anything that grows without bound:
+#
+#   python soak.py --frames 50000                  # headless
+#   python soak.py --window                        # in a hidden Tk window
+#   python soak.py --csv soak.csv -- --village 50  # extra main.py options after --
+#
+# Every --sample-every frames it records the canvas item count, the memory
+# traced by tracemalloc (current and the peak since the previous sample) and
+# the median frame time (simulation steps plus draw). After a warm-up, each
+# series gets a least-squares trend line; the growth it predicts over the
+# sampled stretch, relative to the series' mean, must stay under that
+# metric's threshold. Exits non-zero when any metric fails.
+#
+# Frame time is measured under tracemalloc, which slows every allocation;
+# compare frame times between soak runs, not with bench.py.
+
+# Detail stays fixed so every frame does the same work
+SOAK_ARGS = ["--adaptive", "off"]
+
+METRICS = ("canvas_items", "traced_kb", "peak_kb", "frame_ms")
+
+
+class Sampler:
+    def __init__(self, scene, frames, sample_every, on_done=None):
+        self.scene = scene
+        self.frames = frames
+        self.sample_every = sample_every
+        self.on_done = on_done
+        self.frame = 0
+        self.samples = [] # dicts of frame + METRICS
+        self._step_time = 0.0 # Seconds spent in steps since the last frame
+        self._frame_ms = []
+        self._advance = scene.advance
+        self._draw = scene.draw
+
+    def install(self):
+        # Wrap the scene's step and draw; the scheduler picks these up when
+        # animate_scene() creates it
+        self.scene.advance = self.advance
+        self.scene.draw = self.draw
+
+    def advance(self):
+        start = time.perf_counter()
+        self._advance()
+        self._step_time += time.perf_counter() - start
+
+    def draw(self):
+        start = time.perf_counter()
+        self._draw()
+        self._frame_ms.append((self._step_time + time.perf_counter() - start) * 1000)
+        self._step_time = 0.0
+        self.frame += 1
+        if self.frame % self.sample_every == 0:
+            self.sample()
+        if self.frame >= self.frames and self.on_done:
+            self.on_done()
+
+    def sample(self):
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.samples.append({
+            'frame': self.frame,
+            'canvas_items': len(self.scene.screen.getcanvas().find_all()),
+            'traced_kb': current / 1024,
+            'peak_kb': peak / 1024,
+            'frame_ms': statistics.median(self._frame_ms),
+        })
+        self._frame_ms = []
+
+
+def growth(samples, metric):
+    # Relative growth over the samples predicted by their trend line
+    frames = [sample['frame'] for sample in samples]
+    values = [sample[metric] for sample in samples]
+    mean = statistics.fmean(values)
+    if len(samples) < 3 or mean == 0 or len(set(values)) == 1:
+        return 0.0
+    slope = statistics.linear_regression(frames, values).slope
+    return slope * (frames[-1] - frames[0]) / mean
+
+
+def run_soak(frames, sample_every, window=False, scene_args=()):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+    args = SOAK_ARGS + list(scene_args)
+    if not window:
+        args = ["--headless", "--frames", str(frames + 1)] + args # The build's first update counts too
+    scene = main.Scene(main.parse_options(args))
+    screen = scene.screen
+    sampler = Sampler(scene, frames, sample_every)
+    if window:
+        screen.getcanvas().winfo_toplevel().withdraw() # Tk still draws into the hidden window
+        def done():
+            scene.close()
+            screen.getcanvas().quit() # Leaves mainloop
+        sampler.on_done = done
+    sampler.install()
+    tracemalloc.start()
+    try:
+        scene.run()
+    finally:
+        tracemalloc.stop()
+    return sampler.samples
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-test the animation loop for unbounded growth")
+    parser.add_argument("--frames", type=int, default=20000, help="frames to run")
+    parser.add_argument("--sample-every", type=int, default=500, help="frames between samples")
+    parser.add_argument("--warmup", type=float, default=0.2,
+                        help="fraction of the samples ignored while pools and caches fill up")
+    parser.add_argument("--window", action="store_true",
+                        help="run in a hidden Tk window instead of headless")
+    parser.add_argument("--max-item-growth", type=float, default=0.05,
+                        help="allowed relative canvas item growth over the run")
+    parser.add_argument("--max-memory-growth", type=float, default=0.10,
+                        help="allowed relative growth of traced and peak memory")
+    parser.add_argument("--max-frame-time-growth", type=float, default=0.25,
+                        help="allowed relative growth of the median frame time")
+    parser.add_argument("--csv", help="write the samples to this CSV file")
+    parser.add_argument("scene_args", nargs="*", help="main.py options, after --")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    samples = run_soak(args.frames, args.sample_every, args.window, args.scene_args)
+    elapsed = time.perf_counter() - start
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=("frame",) + METRICS)
+            writer.writeheader()
+            writer.writerows(samples)
+
+    steady = samples[int(len(samples) * args.warmup):]
+    print("Soaked %d frames in %.1fs, %d samples (%d after warm-up)" % (
+        samples[-1]['frame'] if samples else 0, elapsed, len(samples), len(steady)))
+    if len(steady) < 3:
+        print("Not enough samples to judge a trend; run more frames or sample more often")
+        return 2
+    limits = {
+        'canvas_items': args.max_item_growth,
+        'traced_kb': args.max_memory_growth,
+        'peak_kb': args.max_memory_growth,
+        'frame_ms': args.max_frame_time_growth,
+    }
+    failed = []
+    print("%-14s %10s %10s %9s %8s" % ("metric", "first", "last", "growth", "limit"))
+    for metric in METRICS:
+        change = growth(steady, metric)
+        flag = ""
+        if change > limits[metric]:
+            flag = "  GROWING"
+            failed.append(metric)
+        print("%-14s %10.1f %10.1f %+8.1f%% %7.0f%%%s" % (
+            metric, steady[0][metric], steady[-1][metric], change * 100, limits[metric] * 100, flag))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
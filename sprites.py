@@ -0,0 +1,123 @@
+import math
+
+import canvaspen
+
+# --- Retained-Mode Sprites ---
+# Animated elements whose shape does not change from frame to frame are built
+# once as canvas items and then moved or re-posed, instead of being cleared and
+# re-traced with turtle moves every frame.
+
+_sprite_count = 0
+_recorded_shapes = {} # (draw function, args, backend) -> (list of (kind, canvas coords, options), return value)
+
+def drawn_items(canvas):
+    # The visible line, polygon and oval items of a HeadlessCanvas as
+    # (kind, canvas coords, options), in stacking order
+    shape = []
+    for kind, cl, options in canvas.items():
+        if kind not in ("line", "polygon", "oval") or len(cl) < 4:
+            continue
+        color = options.get("fill", "")
+        if not color and not options.get("outline"):
+            continue # Turtle's own hidden cursor and unused line items
+        shape.append((kind, tuple(cl), {k: options[k] for k in ("fill", "outline", "width", "capstyle") if k in options}))
+    return shape
+
+
+def record_prop(draw_function, *args, backend="turtle", **kwargs):
+    # Run a drawing helper once on an offscreen canvas, with a pen of the
+    # given backend (see canvaspen.py), and keep the resulting items, so
+    # sprite geometry comes from the very same helper.
+    # Returns (shape, whatever the helper returned).
+    key = (draw_function, args, tuple(sorted(kwargs.items())), backend)
+    recorded = _recorded_shapes.get(key)
+    if recorded is None:
+        offscreen, t = canvaspen.offscreen_pen(backend)
+        result = draw_function(t, *args, **kwargs)
+        offscreen.update()
+        shape = drawn_items(offscreen.cv)
+        canvaspen.release(offscreen)
+        recorded = _recorded_shapes[key] = (shape, result)
+    return recorded
+
+
+def record_shape(draw_function, *args, backend="turtle", **kwargs):
+    return record_prop(draw_function, *args, backend=backend, **kwargs)[0]
+
+
+def create_item(canvas, kind, coords, **options):
+    # One recorded item, of any kind drawn_items() keeps
+    return getattr(canvas, "create_" + kind)(*coords, **options)
+
+
+class Sprite:
+    # A group of canvas items sharing one tag. Moving the sprite is a single
+    # canvas move() of that tag, whatever the number of items.
+    def __init__(self, screen, shape, x=0, y=0):
+        global _sprite_count
+        _sprite_count += 1
+        self.cv = screen.getcanvas()
+        self.tag = "sprite%d" % _sprite_count
+        self.x = 0
+        self.y = 0
+        self.items = []
+        for kind, cl, options in shape:
+            self.items.append(create_item(self.cv, kind, cl, tags=(self.tag,), **options))
+        self.move_to(x, y)
+
+    @classmethod
+    def from_drawing(cls, screen, draw_function, *args, backend="turtle", **kwargs):
+        # Geometry is recorded with the helper drawing at base (0, 0)
+        return cls(screen, record_shape(draw_function, 0, 0, *args, backend=backend, **kwargs))
+
+    def move_to(self, x, y):
+        if x != self.x or y != self.y:
+            self.cv.move(self.tag, x - self.x, -(y - self.y)) # Canvas y grows downwards
+            self.x = x
+            self.y = y
+
+    def delete(self):
+        self.cv.delete(self.tag)
+        self.items = []
+
+
+class RaySprite:
+    # The sun's rays: `num_rays` line items around a centre. A pose is one
+    # (rotation offset in degrees, ray length) pair; the coordinates of each
+    # pose are computed once and cached, so a frame only re-poses the items.
+    def __init__(self, screen, center_x, center_y, inner_radius, num_rays, color, width=2):
+        self.cv = screen.getcanvas()
+        self.center_x = center_x
+        self.center_y = center_y
+        self.inner_radius = inner_radius
+        self.num_rays = num_rays
+        self.items = [self.cv.create_line(0, 0, 0, 0, fill=color, width=width, capstyle="round")
+                      for _ in range(num_rays)]
+        self._poses = {}
+        self.pose = None
+
+    def _pose_coords(self, offset, length):
+        coords = []
+        for i in range(self.num_rays):
+            angle = math.radians((360 / self.num_rays) * i + offset)
+            cos_a, sin_a = math.cos(angle), math.sin(angle)
+            start, end = self.inner_radius, self.inner_radius + length
+            coords.append((self.center_x + start * cos_a, -(self.center_y + start * sin_a),
+                           self.center_x + end * cos_a, -(self.center_y + end * sin_a)))
+        return coords
+
+    def show(self, offset, length):
+        pose = (offset, length)
+        if pose == self.pose:
+            return
+        coords = self._poses.get(pose)
+        if coords is None:
+            coords = self._poses[pose] = self._pose_coords(offset, length)
+        for item, cl in zip(self.items, coords):
+            self.cv.coords(item, *cl)
+        self.pose = pose
+
+    def delete(self):
+        for item in self.items:
+            self.cv.delete(item)
+        self.items = []
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import FixedStepScheduler
+
+
+# --- Fake Clock ---
+# Stands in for both the clock and the screen's ontimer(): each timer fires
+# exactly when it is due, so the run takes no real time.
+class FakeScreen:
+    def __init__(self):
+        self.now = 0.0
+        self.pending = None
+
+    def clock(self):
+        return self.now
+
+    def ontimer(self, fun, ms):
+        self.pending = (fun, ms)
+
+    def run_until(self, end):
+        while self.pending and self.now < end:
+            fun, ms = self.pending
+            self.pending = None
+            self.now += ms / 1000.0
+            fun()
+
+
+def run(target_fps, seconds=18.0, step_hz=20):
+    screen = FakeScreen()
+    scheduler = FixedStepScheduler(screen, lambda: None, lambda: None, step_hz=step_hz,
+                                   target_fps=target_fps, clock=screen.clock)
+    scheduler.start()
+    screen.run_until(seconds)
+    return scheduler, screen.now
+
+
+class FixedStepSchedulerTest(unittest.TestCase):
+    def assert_keeps_pace(self, target_fps):
+        scheduler, elapsed = run(target_fps)
+        stats = scheduler.stats()
+        # Steps follow the clock to within one frame's worth
+        self.assertAlmostEqual(stats['steps'], elapsed * 20, delta=20 / target_fps + 1)
+        self.assertEqual(stats['dropped_frames'], 0)
+        self.assertAlmostEqual(stats['frames'], elapsed * target_fps, delta=2)
+
+    def test_1_fps(self):
+        self.assert_keeps_pace(1)
+
+    def test_3_fps(self):
+        self.assert_keeps_pace(3)
+
+    def test_20_fps(self):
+        self.assert_keeps_pace(20)
+
+    def test_rejects_fps_above_step_rate(self):
+        with self.assertRaises(ValueError):
+            FixedStepScheduler(FakeScreen(), None, None, step_hz=20, target_fps=21)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+from bisect import bisect_left, bisect_right
+
+import headless
+import sprites
+from simulation import WINDOW_FLICKER_INTERVAL
+
+# --- Instanced Village ---
+# Each prop type (cabin, tree variant, fence) is a Prototype: its geometry is
+# recorded once from the same drawing helper the single-cabin scene uses, at
+# base (0, 0). Instances only carry a position, a tint and a flicker phase.
+#
+# Canvas items exist only for instances inside the view: the layer keeps
+# instances sorted by their left edge, finds the visible ones by bisection,
+# creates items for instances that scroll in and deletes those that scroll
+# out. All instance items share the "village" tag, so panning the camera is a
+# single canvas move(). Window lights are also tagged by flicker phase, so
+# recoloring every window of a phase is a single itemconfigure().
+#
+# Instances are stacked in layout order, all just below a marker item, which
+# keeps the village above the static layer and below everything animated in
+# front of it.
+
+_tinted = {} # (color, tint, amount) -> color
+
+def tint_color(color, tint, amount):
+    # Blend a Tk color `amount` of the way towards `tint`
+    if not color or not amount:
+        return color
+    key = (color, tint, amount)
+    blended = _tinted.get(key)
+    if blended is None:
+        rgb = headless.parse_color(color)
+        target = headless.parse_color(tint)
+        blended = _tinted[key] = "#%02x%02x%02x" % tuple(round(c + (t - c) * amount) for c, t in zip(rgb, target))
+    return blended
+
+
+class Prototype:
+    def __init__(self, shape, result=None):
+        self.shape = shape    # [(kind, canvas coords at base (0, 0), options)]
+        self.result = result  # Whatever the drawing helper returned
+        xs = [x for _, cl, _ in shape for x in cl[0::2]]
+        self.left = min(xs, default=0.0)
+        self.right = max(xs, default=0.0)
+        self.chimney = None   # (dx, dy) from the base to where smoke starts
+        self.window = None    # (dx, dy, size) of the window light
+        self._tints = {}
+
+    @classmethod
+    def from_drawing(cls, draw_function, *args, backend="turtle", **kwargs):
+        return cls(*sprites.record_prop(draw_function, 0, 0, *args, backend=backend, **kwargs))
+
+    def tinted(self, tint, amount):
+        # The shape with every fill and outline blended towards `tint`
+        if not tint or not amount:
+            return self.shape
+        key = (tint, amount)
+        shape = self._tints.get(key)
+        if shape is None:
+            shape = []
+            for kind, cl, options in self.shape:
+                options = dict(options)
+                for name in ("fill", "outline"):
+                    if options.get(name):
+                        options[name] = tint_color(options[name], tint, amount)
+                shape.append((kind, cl, options))
+            self._tints[key] = shape
+        return shape
+
+
+class Village:
+    def __init__(self, screen, prototypes, view_width, window_colors,
+                 window_border="black", window_pane="saddlebrown"):
+        self.cv = screen.getcanvas()
+        self.prototypes = prototypes # name -> Prototype
+        self.view_width = view_width
+        self.window_colors = window_colors
+        self.window_border = window_border
+        self.window_pane = window_pane
+        self.instances = [] # (left, right, name, x, y, tint, amount, phase), sorted by left on finish()
+        self._lefts = []
+        self._max_width = 0.0
+        self.marker = None
+        self.camera = None    # Camera x the live items are positioned for
+        self.live = {}        # instance index -> its tag
+        self._phase_colors = {} # window phase -> color index shown
+        self.created = 0      # Instances instantiated so far (items made on scroll-in)
+
+    def add(self, name, x, y, tint=None, amount=0.0, phase=0):
+        prototype = self.prototypes[name]
+        self.instances.append((x + prototype.left, x + prototype.right, name, x, y, tint, amount, phase))
+
+    def finish(self):
+        # Sort for culling; returns the chimneys as (x, y, phase) and the extent
+        self.instances.sort(key=lambda instance: instance[0])
+        self._lefts = [instance[0] for instance in self.instances]
+        self._max_width = max((instance[1] - instance[0] for instance in self.instances), default=0.0)
+        chimneys = []
+        for left, right, name, x, y, tint, amount, phase in self.instances:
+            chimney = self.prototypes[name].chimney
+            if chimney is not None:
+                chimneys.append((x + chimney[0], y + chimney[1], phase))
+        extent = (min(self._lefts, default=0.0), max((i[1] for i in self.instances), default=0.0))
+        return chimneys, extent
+
+    def place_marker(self):
+        # Call once the static layer is drawn: instances go just below this
+        self.marker = self.cv.create_line(0, 0, 0, 0, state="hidden", tags=("village_marker",))
+
+    def set_prototypes(self, prototypes):
+        # Swap in re-recorded geometry (e.g. another circle resolution); live
+        # instances are rebuilt on the next draw
+        self.prototypes = prototypes
+        self.clear()
+
+    def clear(self):
+        for tag in self.live.values():
+            self.cv.delete(tag)
+        self.live = {}
+
+    def visible(self, camera):
+        left = camera - self.view_width / 2
+        right = camera + self.view_width / 2
+        lo = bisect_left(self._lefts, left - self._max_width)
+        hi = bisect_right(self._lefts, right)
+        return [i for i in range(lo, hi) if self.instances[i][1] >= left]
+
+    def draw(self, camera, frame):
+        cv = self.cv
+        if self.camera is not None and camera != self.camera and self.live:
+            cv.move("village", self.camera - camera, 0)
+        self.camera = camera
+        visible = self.visible(camera)
+        keep = set(visible)
+        for i in [i for i in self.live if i not in keep]:
+            cv.delete(self.live.pop(i))
+        for i in visible:
+            if i not in self.live:
+                self._instantiate(i, camera, frame)
+        for phase, shown in list(self._phase_colors.items()):
+            index = (frame + phase) // WINDOW_FLICKER_INTERVAL % 2
+            if index != shown:
+                cv.itemconfigure("village_window%d" % phase, fill=self.window_colors[index])
+                self._phase_colors[phase] = index
+
+    def _instantiate(self, i, camera, frame):
+        cv = self.cv
+        left, right, name, x, y, tint, amount, phase = self.instances[i]
+        prototype = self.prototypes[name]
+        tag = "village%d" % i
+        tags = ("village", tag)
+        ox = x - camera # Screen x of the base
+        oy = -y
+        for kind, cl, options in prototype.tinted(tint, amount):
+            coords = [c + (oy if k & 1 else ox) for k, c in enumerate(cl)]
+            sprites.create_item(cv, kind, coords, tags=tags, **options)
+        if prototype.window is not None:
+            phase %= WINDOW_FLICKER_INTERVAL
+            index = (frame + phase) // WINDOW_FLICKER_INTERVAL % 2
+            self._phase_colors[phase] = index
+            w_x, w_y, w_size = ox + prototype.window[0], oy - prototype.window[1], prototype.window[2]
+            cv.create_polygon(w_x, w_y, w_x + w_size, w_y, w_x + w_size, w_y - w_size, w_x, w_y - w_size,
+                              fill=self.window_colors[index], outline=self.window_border, width=1,
+                              tags=tags + ("village_window%d" % phase,))
+            cv.create_line(w_x + w_size / 2, w_y, w_x + w_size / 2, w_y - w_size, fill=self.window_pane, width=1, tags=tags)
+            cv.create_line(w_x, w_y - w_size / 2, w_x + w_size, w_y - w_size / 2, fill=self.window_pane, width=1, tags=tags)
+        # Keep instances stacked in layout order whichever side they scroll in from
+        above = [j for j in self.live if j > i]
+        if above:
+            cv.tag_lower(tag, self.live[min(above)])
+        elif self.marker is not None:
+            cv.tag_lower(tag, self.marker)
+        self.live[i] = tag
+        self.created += 1